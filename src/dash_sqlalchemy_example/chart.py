@@ -1,6 +1,6 @@
-import pandas as pd
 import plotly.express as px
-from dash_sqlalchemy_example.server import connection
+
+from dash_sqlalchemy_example.data import LINE_CHART_FEATURES, get_line_chart_data
 
 
 def line_chart(feature):
@@ -17,15 +17,15 @@ def line_chart(feature):
      """
 
     # take the feature parameter from the function and check it is valid
-    if feature not in ["sports", "participants", "events", "countries"]:
+    if feature not in LINE_CHART_FEATURES:
         raise ValueError(
             'Invalid value for "feature". Must be one of ["sports", "participants", "events", "countries"]')
     else:
         # Make sure it is lowercase to match the dataframe column names
         feature = feature.lower()
 
-    cols = ["type", "year", "host", "events", "sports", "participants", "countries"]
-    line_chart_df = pd.read_sql_table(table_name="event", con=connection, columns=cols)
+    # Only the type, year and feature columns are read, and they are cached until the database changes
+    line_chart_df = get_line_chart_data(feature)
 
     # Set the title for the chart using the value of 'feature'
     title_text = f"How has the number of {feature} changed over time?"
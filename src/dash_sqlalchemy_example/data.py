@@ -0,0 +1,53 @@
+"""Data access for the charts in the example app.
+
+pandas.read_sql_table() reflects the table schema from the database every time it is called. Instead, the select
+statements for the charts are built once from the models, with only the columns each chart needs. SQLAlchemy caches
+the compiled SQL for each statement, so it is only compiled the first time it runs.
+
+Each query borrows a connection from the engine's pool and returns it when the query has finished, so callbacks that
+run at the same time in different threads do not share a connection. The results are cached until the data in the
+database changes, see get_database_version().
+"""
+from functools import lru_cache
+
+import pandas as pd
+
+from paralympics_common.data_version import get_database_version
+from dash_sqlalchemy_example.models import Event
+from dash_sqlalchemy_example.server import db, server
+
+# Columns that line_chart() can show
+LINE_CHART_FEATURES = ["sports", "participants", "events", "countries"]
+
+# One statement per feature with only the columns the line chart uses
+_line_chart_selects = {
+    feature: db.select(Event.type, Event.year, getattr(Event, feature)).order_by(Event.year)
+    for feature in LINE_CHART_FEATURES
+}
+
+
+def get_line_chart_data(feature):
+    """Returns the type, year and feature columns of the events table.
+
+    The DataFrame is cached and shared between callbacks, so do not modify it.
+
+    Args:
+        feature: events, sports, participants or countries
+
+    Returns:
+        df: pandas DataFrame with the columns type, year and the feature
+    """
+    return _line_chart_data(feature, get_database_version(_engine()))
+
+
+@lru_cache(maxsize=16)
+def _line_chart_data(feature, version):
+    with _engine().connect() as connection:
+        return pd.read_sql(_line_chart_selects[feature], connection)
+
+
+@lru_cache(maxsize=1)
+def _engine():
+    """The Flask-SQLAlchemy engine, which is created in an app context but can be used outside one."""
+    with server.app_context():
+        return db.engine
@@ -5,6 +5,7 @@ from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 
 from dash_sqlalchemy_example.add_data import add_data
+from paralympics_common.db import dispose_after_fork, pool_options, set_sqlite_pragmas
 
 
 class Base(DeclarativeBase):
@@ -19,13 +20,24 @@ paralympic_db = Path(__file__).parent.joinpath("paralympics.sqlite")
 server.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + str(paralympic_db)
 # server.config["SQLALCHEMY_ECHO"] = True
 
+# Connection pool shared by the threads of the server. Each query checks out its own connection (see data.py).
+# Override any value with an environment variable, e.g. FLASK_SQLALCHEMY_ENGINE_OPTIONS__pool_size=10
+server.config["SQLALCHEMY_ENGINE_OPTIONS"] = pool_options()
+server.config.from_prefixed_env()
+
 
 db.init_app(server)
+dispose_after_fork(db, server)
+
 
 # Avoid circular import
 from dash_sqlalchemy_example.models import Event, Region
 
 with server.app_context():
+    # Readers carry on while another connection writes, so chart queries are not blocked by a write and a write does
+    # not fail because of a long read
+    set_sqlite_pragmas(db.engine, {"journal_mode": "WAL"})
     db.create_all()
-    connection = db.engine.connect()
-    add_data(db, connection)
+    # Use a connection from the pool only while the data is added, the charts get their own connections (see data.py)
+    with db.engine.begin() as connection:
+        add_data(db, connection)
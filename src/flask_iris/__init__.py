@@ -1,6 +1,10 @@
 from flask import Flask
+from flask_iris.coalescer import create_coalescer
 from flask_iris.config import Config
-from flask_iris.create_ml_model import create_model
+from flask_iris.metrics import create_metrics
+from flask_iris.model_registry import model_registry
+from flask_iris.prediction_cache import PredictionCache
+from flask_iris.preload import preload_model
 
 
 def create_app(test_config=None):
@@ -24,7 +28,25 @@ def create_app(test_config=None):
     with app.app_context():
         from flask_iris import routes
 
-    # If the ml model file isn't present, create it
-    create_model("lr")
+    # The model is trained by create_ml_model.py, never while the app starts or handles a request
+    if not model_registry.model_file.exists():
+        app.logger.warning(f"{model_registry.model_file} does not exist, train the model with: "
+                           f"python -m flask_iris.create_ml_model")
+
+    # Optionally combine concurrent single flower predictions into batches
+    if app.config["PREDICTION_COALESCE"]:
+        app.extensions["prediction_coalescer"] = create_coalescer(app.config)
+
+    # Cache the single flower predictions, as the form submits the same measurements many times
+    if app.config["PREDICTION_CACHE_SIZE"]:
+        app.extensions["prediction_cache"] = PredictionCache(maxsize=app.config["PREDICTION_CACHE_SIZE"],
+                                                             decimals=app.config["PREDICTION_CACHE_DECIMALS"])
+
+    # Latency, predicted variety and input feature measurements shown by /metrics
+    app.extensions["prediction_metrics"] = create_metrics()
+
+    # Load the model now rather than on the first request, last so that everything created above is frozen too
+    if app.config["PRELOAD_MODEL"]:
+        preload_model(app)
 
     return app
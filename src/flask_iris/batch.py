@@ -0,0 +1,132 @@
+"""Predictions for many flowers at once.
+
+The rows are validated into one float64 NumPy array with a column for each feature, and the model is called once for
+the whole array. Calling the model once for N rows is much faster than calling it N times, as most of the cost of a
+call to predict() is the same however many rows there are.
+
+The model predicts the label encoded species, 0, 1 or 2, which are converted to the variety names by indexing the
+VARIETIES array with the array of predictions.
+"""
+import io
+import json
+
+import numpy as np
+import pandas as pd
+
+from flask_iris.model_registry import model_registry
+
+# The model features, in the order of the columns the model was trained with (see create_ml_model.py)
+FEATURES = ["sepal_length", "sepal_width", "petal_length", "petal_width"]
+
+# Variety names indexed by the label the model predicts, the LabelEncoder sorts the species alphabetically
+VARIETIES = np.array(["iris-setosa", "iris-versicolor", "iris-virginica"])
+
+# Number of rows converted to text at a time when the results are streamed
+CHUNK_ROWS = 10000
+
+
+def to_feature_array(rows):
+    """Validates the rows from a JSON request and converts them to an array for the model.
+
+    Args:
+        rows: list of rows, each either a list of the 4 feature values or a dictionary with a key for each feature
+
+    Returns:
+        2D float64 NumPy array with a row for each flower and a column for each feature
+
+    Raises:
+        ValueError: if there are no rows or a row does not have a number for each feature
+    """
+    if not isinstance(rows, list) or not rows:
+        raise ValueError("rows must be a list with at least one row")
+    if isinstance(rows[0], dict):
+        try:
+            rows = [[row[feature] for feature in FEATURES] for row in rows]
+        except (KeyError, TypeError):
+            raise ValueError(f"Each row must be an object with the keys {FEATURES}")
+    try:
+        values = np.asarray(rows, dtype=np.float64)
+    except (ValueError, TypeError):
+        raise ValueError(f"Each row must have a number for each of {FEATURES}")
+    return _check_array(values)
+
+
+def read_csv_features(file):
+    """Reads the features from an uploaded CSV file into an array for the model.
+
+    Args:
+        file: file-like object with a header row that includes the FEATURES columns, other columns are ignored
+
+    Returns:
+        2D float64 NumPy array with a row for each flower and a column for each feature
+
+    Raises:
+        ValueError: if a feature column is missing or has a value that is not a number
+    """
+    try:
+        df = pd.read_csv(file, usecols=FEATURES, dtype=np.float64, encoding="utf-8-sig")
+    except (ValueError, pd.errors.ParserError, pd.errors.EmptyDataError) as e:
+        raise ValueError(f"The CSV file must have a header row and a number in each of the columns {FEATURES}. {e}")
+    return _check_array(df[FEATURES].to_numpy())
+
+
+def predict_batch(values, probabilities=False, model=None):
+    """Predicts the variety of every row with a single call to the model.
+
+    Args:
+        values: 2D float64 NumPy array from to_feature_array() or read_csv_features()
+        probabilities: if True also return the probability of each variety
+        model: the model to use, by default the one in the model registry
+
+    Returns:
+        varieties: NumPy array with the predicted variety name for each row
+        probs: 2D NumPy array with the probability of each variety for each row, or None
+    """
+    if model is None:
+        model = model_registry.get_model()
+    varieties = VARIETIES[model.predict(values)]
+    probs = model.predict_proba(values) if probabilities else None
+    return varieties, probs
+
+
+def iter_json(varieties, probs, model_version):
+    """Yields the results as the parts of a JSON document, so a large response is not built in memory at once.
+
+    The document is {"model_version": ..., "predictions": [{"variety": ..., "probabilities": {...}}, ...]}
+    """
+    yield '{"model_version": ' + json.dumps(model_version) + ', "predictions": ['
+    for start in range(0, len(varieties), CHUNK_ROWS):
+        end = start + CHUNK_ROWS
+        if probs is None:
+            rows = [{"variety": variety} for variety in varieties[start:end].tolist()]
+        else:
+            rows = [{"variety": variety, "probabilities": dict(zip(VARIETIES.tolist(), row))}
+                    for variety, row in zip(varieties[start:end].tolist(), probs[start:end].tolist())]
+        separator = ", " if start else ""
+        yield separator + json.dumps(rows)[1:-1]
+    yield "]}"
+
+
+def iter_csv(values, varieties, probs):
+    """Yields the results as CSV text, with the feature columns, the variety and the probabilities if requested."""
+    columns = FEATURES + ["variety"]
+    if probs is not None:
+        columns += [f"p_{variety}" for variety in VARIETIES]
+    yield ",".join(columns) + "\n"
+    for start in range(0, len(varieties), CHUNK_ROWS):
+        end = start + CHUNK_ROWS
+        df = pd.DataFrame(values[start:end], columns=FEATURES)
+        df["variety"] = varieties[start:end]
+        if probs is not None:
+            df[columns[len(FEATURES) + 1:]] = probs[start:end]
+        text = io.StringIO()
+        df.to_csv(text, header=False, index=False)
+        yield text.getvalue()
+
+
+def _check_array(values):
+    if values.ndim != 2 or values.shape[0] == 0 or values.shape[1] != len(FEATURES):
+        raise ValueError(f"Each row must have a number for each of {FEATURES}")
+    if not np.isfinite(values).all():
+        raise ValueError("The feature values must be finite numbers")
+    return values
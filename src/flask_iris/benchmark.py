@@ -0,0 +1,226 @@
+"""Measures the throughput of the batch prediction API in rows per second.
+
+Each batch size is sent to POST /predict and POST /predict/csv using the Flask test client, so the timings include
+validation, prediction and converting the results to JSON or CSV, but not the network.
+
+It also measures single flower predictions made from many threads at once, with and without the coalescer that
+combines them into batches (see coalescer.py), and compares the load time and memory used by each worker process for a
+model saved with pickle and with joblib (see model_registry.py). Finally it compares forked workers with and without
+the model preloaded by the app factory (see preload.py).
+
+To run the benchmark:
+
+    python -m flask_iris.benchmark
+"""
+import gc
+import io
+import multiprocessing
+import pickle
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+
+from flask_iris import create_app
+from flask_iris.coalescer import create_coalescer
+from flask_iris.model_registry import load_model
+from flask_iris.preload import preload_model
+
+BATCH_SIZES = [1, 10, 100, 1000, 10000, 100000]
+
+
+def make_rows(n, seed=42):
+    """Returns n random rows of feature values in the range of the iris data set."""
+    rng = np.random.default_rng(seed)
+    return np.round(rng.uniform([4.3, 2.0, 1.0, 0.1], [7.9, 4.4, 6.9, 2.5], size=(n, 4)), 1)
+
+
+def run(batch_sizes=BATCH_SIZES, min_seconds=0.5):
+    """Prints the rows per second for each batch size, repeating each one for at least min_seconds."""
+    app = create_app()
+    client = app.test_client()
+    print(f"{'rows':>8} {'json rows/s':>14} {'csv rows/s':>14}")
+    for n in batch_sizes:
+        rows = make_rows(n)
+        json_body = {"rows": rows.tolist()}
+        csv_body = "sepal_length,sepal_width,petal_length,petal_width\n" + "\n".join(
+            ",".join(str(value) for value in row) for row in rows.tolist())
+
+        def post_json():
+            return client.post("/predict", json=json_body).get_data()
+
+        def post_csv():
+            return client.post("/predict/csv", data={"file": (io.BytesIO(csv_body.encode()), "rows.csv")}).get_data()
+
+        print(f"{n:>8} {n / _time(post_json, min_seconds):>14,.0f} {n / _time(post_csv, min_seconds):>14,.0f}")
+
+
+def run_concurrent(threads=32, seconds=2.0):
+    """Prints the predictions per second and latency of single flower predictions made from many threads at once."""
+    app = create_app()
+    # The routes can only be imported once the app has been created
+    from flask_iris.routes import make_prediction
+
+    rows = make_rows(1000).tolist()
+    print(f"{'coalesce':>8} {'requests/s':>12} {'p50 ms':>8} {'p99 ms':>8}")
+    for coalesce in [False, True]:
+        if coalesce:
+            app.extensions["prediction_coalescer"] = create_coalescer(app.config)
+        else:
+            app.extensions.pop("prediction_coalescer", None)
+        latencies = []
+        stop = time.perf_counter() + seconds
+
+        def worker():
+            with app.app_context():
+                i = 0
+                while time.perf_counter() < stop:
+                    start = time.perf_counter()
+                    make_prediction(rows[i % len(rows)])
+                    latencies.append(time.perf_counter() - start)
+                    i += 1
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+        print(f"{str(coalesce):>8} {len(latencies) / seconds:>12,.0f} {p50:>8.2f} {p99:>8.2f}")
+
+
+def compare_artifacts(n_features=2000000, workers=4):
+    """Prints the load time and memory per worker process of a large model saved with pickle and with joblib.
+
+    The iris model is too small to show a difference, so a LogisticRegression with n_features coefficients for each
+    species is used, about 48 MB with the default. Each worker is a forked process that loads the model and reads all
+    of its coefficients, as a worker of a web server would. Memory is read from /proc, so this only runs on Linux.
+    PSS counts the pages shared by several processes divided between them.
+    """
+    model = LogisticRegression().fit(make_rows(30), np.arange(30) % 3)
+    model.coef_ = np.random.default_rng(42).random((3, n_features))
+    model.n_features_in_ = n_features
+    with tempfile.TemporaryDirectory() as folder:
+        files = {"pickle": Path(folder, "model.pkl"), "joblib": Path(folder, "model.joblib")}
+        with open(files["pickle"], "wb") as f:
+            pickle.dump(model, f)
+        joblib.dump(model, files["joblib"])
+        print(f"{'format':>8} {'load ms':>8} {'RSS MB':>8} {'PSS MB':>8} {'private MB':>11}")
+        for name, model_file in files.items():
+            context = multiprocessing.get_context("fork")
+            barrier = context.Barrier(workers)
+            results = context.Queue()
+            processes = [context.Process(target=_worker, args=(model_file, barrier, results)) for _ in range(workers)]
+            for p in processes:
+                p.start()
+            stats = [results.get() for _ in processes]
+            for p in processes:
+                p.join()
+            mean = {key: np.mean([s[key] for s in stats]) for key in stats[0]}
+            print(f"{name:>8} {mean['load_ms']:>8.1f} {mean['Rss']:>8.1f} {mean['Pss']:>8.1f} "
+                  f"{mean['Private']:>11.1f}")
+
+
+def _worker(model_file, barrier, results):
+    """Loads the model in a worker process and reports the memory it uses once all the workers have loaded it."""
+    before = _memory()
+    start = time.perf_counter()
+    model = load_model(model_file)
+    load_ms = (time.perf_counter() - start) * 1000
+    # Read every coefficient, as predictions would
+    float(np.sum(model.coef_))
+    # Wait for every worker to load the model, so the shared pages are counted for all of them
+    barrier.wait()
+    after = _memory()
+    results.put({"load_ms": load_ms, **{key: after[key] - before[key] for key in after}})
+    barrier.wait()
+
+
+def _memory():
+    """Returns the RSS, PSS and private memory of this process in MB."""
+    values = {}
+    for line in Path("/proc/self/smaps_rollup").read_text().splitlines()[1:]:
+        key, value = line.split(":")
+        values[key] = int(value.split()[0]) / 1024
+    return {"Rss": values["Rss"], "Pss": values["Pss"],
+            "Private": values["Private_Clean"] + values["Private_Dirty"]}
+
+
+def compare_preload(workers=4):
+    """Prints the first request latency of each forked worker and the total memory with and without preloading.
+
+    For each option a new process is started that creates the app, optionally preloads the model, then forks the
+    workers, as gunicorn --preload does. Each worker times its first request to POST /predict, then runs a full garbage
+    collection as a long running worker eventually would. The memory is read from /proc while all the workers are
+    running, so this only runs on Linux. The total is the PSS of the parent and all the workers.
+    """
+    print(f"{'preload':>8} {'first request ms':>17} {'total PSS MB':>13} {'private MB/worker':>18}")
+    # Spawn rather than fork the parent, so it does not start with the model loaded by an earlier benchmark
+    context = multiprocessing.get_context("spawn")
+    for preload in [False, True]:
+        results = context.Queue()
+        parent = context.Process(target=_preforked_server, args=(preload, workers, results))
+        parent.start()
+        stats, parent_pss = results.get()
+        parent.join()
+        total_pss = parent_pss + sum(s["Pss"] for s in stats)
+        print(f"{str(preload):>8} {np.mean([s['first_ms'] for s in stats]):>17.1f} {total_pss:>13.1f} "
+              f"{np.mean([s['Private'] for s in stats]):>18.1f}")
+
+
+def _preforked_server(preload, workers, results):
+    """Creates the app, forks the workers and sends their statistics and the parent's PSS to results."""
+    app = create_app()
+    if preload:
+        preload_model(app)
+    context = multiprocessing.get_context("fork")
+    barrier = context.Barrier(workers + 1)
+    worker_results = context.Queue()
+    processes = [context.Process(target=_first_request, args=(app, barrier, worker_results)) for _ in range(workers)]
+    for p in processes:
+        p.start()
+    # Measure the parent while the workers are running, so the pages it shares with them are divided between them
+    barrier.wait()
+    parent_pss = _memory()["Pss"]
+    stats = [worker_results.get() for _ in processes]
+    barrier.wait()
+    for p in processes:
+        p.join()
+    results.put((stats, parent_pss))
+
+
+def _first_request(app, barrier, results):
+    """Times the first request made by a forked worker, then reports its memory once all the workers have started."""
+    client = app.test_client()
+    start = time.perf_counter()
+    client.post("/predict", json={"rows": make_rows(1).tolist()}).get_data()
+    first_ms = (time.perf_counter() - start) * 1000
+    gc.collect()
+    barrier.wait()
+    memory = _memory()
+    results.put({"first_ms": first_ms, "Pss": memory["Pss"], "Private": memory["Private"]})
+    barrier.wait()
+
+
+def _time(f, min_seconds):
+    """Returns the mean number of seconds a call to f takes."""
+    f()
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        f()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return elapsed / calls
+
+
+if __name__ == '__main__':
+    run()
+    run_concurrent()
+    compare_artifacts()
+    compare_preload()
@@ -0,0 +1,129 @@
+"""Combines single flower predictions from concurrent requests into one call to the model.
+
+Most of the time taken by model.predict() for one row is the same as for a hundred rows, so when many users submit
+the form at the same time it is faster to predict all their rows together. A PredictionCoalescer queues each row and a
+worker thread takes the rows from the queue: it waits at most max_wait_ms after the first row for more rows to arrive,
+or until it has max_rows, then predicts them all with one call and gives each caller its own result.
+
+A request on its own therefore waits at most max_wait_ms longer than it would without the coalescer.
+
+Turn it on with PREDICTION_COALESCE = True in the config, see config.py.
+"""
+import os
+import queue
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class PredictionCoalescer:
+    """Collects single row predictions and runs them in batches.
+
+    Args:
+        predict_fn: function that takes a 2D float64 NumPy array and returns an array with a prediction for each row
+        max_rows: largest number of rows predicted in one call
+        max_wait_ms: longest time in milliseconds the first row in a batch waits for other rows
+    """
+
+    def __init__(self, predict_fn, max_rows=32, max_wait_ms=5):
+        self.predict_fn = predict_fn
+        self.max_rows = max_rows
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        # Number of batches and rows predicted, to see how well requests are being combined
+        self.batches = 0
+        self.rows = 0
+
+    def predict(self, row):
+        """Returns the prediction for one row, waiting until the batch it is part of has been predicted.
+
+        Args:
+            row: list of the feature values for one flower
+
+        Returns:
+            the prediction for the row
+
+        Raises:
+            the exception raised by predict_fn, if the batch fails
+        """
+        future = Future()
+        self._start()
+        self._queue.put((row, future))
+        return future.result()
+
+    def _start(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="prediction-coalescer", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_rows:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._predict(batch)
+
+    def _predict(self, batch):
+        rows, futures = zip(*batch)
+        try:
+            predictions = self.predict_fn(np.asarray(rows, dtype=np.float64))
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+        self.batches += 1
+        self.rows += len(batch)
+        for future, prediction in zip(futures, predictions):
+            future.set_result(prediction)
+
+    def _after_fork(self):
+        """The worker thread and any queued rows belong to the parent process, a forked worker starts its own."""
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+
+# Coalescers made by create_coalescer(), so a forked worker can start its own worker threads
+_coalescers = weakref.WeakSet()
+
+
+def reset_coalescers_after_fork():
+    """The worker threads and queued rows belong to the parent process, a forked worker starts its own."""
+    for coalescer in list(_coalescers):
+        coalescer._after_fork()
+
+
+# Registered once, however many apps are created
+os.register_at_fork(after_in_child=reset_coalescers_after_fork)
+
+
+def create_coalescer(config):
+    """Returns a PredictionCoalescer for the single flower predictions using the settings in the app config.
+
+    Args:
+        config: the Flask app config
+
+    Returns:
+        PredictionCoalescer that returns the variety name for a row
+    """
+    from flask_iris.batch import predict_batch
+
+    coalescer = PredictionCoalescer(lambda values: predict_batch(values)[0],
+                                    max_rows=config["PREDICTION_BATCH_ROWS"],
+                                    max_wait_ms=config["PREDICTION_BATCH_WAIT_MS"])
+    _coalescers.add(coalescer)
+    return coalescer
@@ -15,6 +15,20 @@ class Config:
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_ECHO = False
+    # Combine the single flower predictions from concurrent requests into one call to the model (see coalescer.py)
+    PREDICTION_COALESCE = False
+    # Largest number of rows in a combined prediction. A batch is predicted as soon as it is full, so set it to about
+    # the number of requests the server handles at once, otherwise every batch waits for PREDICTION_BATCH_WAIT_MS
+    PREDICTION_BATCH_ROWS = 32
+    # Longest time in milliseconds a request waits for other requests to combine with
+    PREDICTION_BATCH_WAIT_MS = 5
+    # Number of single flower predictions kept in the cache, 0 turns the cache off (see prediction_cache.py)
+    PREDICTION_CACHE_SIZE = 4096
+    # Decimal places the measurements are rounded to for the cache, the form fields step in 0.1
+    PREDICTION_CACHE_DECIMALS = 1
+    # Load and warm up the model in create_app() and freeze it in memory, so workers forked from the app share it
+    # rather than each loading it on its first request (see preload.py)
+    PRELOAD_MODEL = False
 
 
 class ProdConfig(Config):
@@ -1,56 +1,145 @@
+"""Trains the iris model and saves it to model.joblib.
+
+Training is done by this script, never by the web app, so a missing model does not hold up the app starting or a
+request. A cross-validated grid search is run for each algorithm, in parallel across the CPU cores. The model with the
+best cross-validation accuracy is scored on a test set that was held back from the search, then saved.
+
+The model is saved with joblib, uncompressed, so that the app can memory-map its arrays (see model_registry.py). It is
+written to a temporary file that then replaces model.joblib, so a running app never reads a partly written model. The
+details of the model are saved next to it in model.json.
+
+To train the model:
+
+    python -m flask_iris.create_ml_model
+
+Add --help to see the options, e.g. the algorithms to try and the number of cores to use.
+"""
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timezone
 from pathlib import Path
+
+import joblib
 import pandas as pd
+import sklearn
 from sklearn.tree import DecisionTreeClassifier
 from sklearn.linear_model import LogisticRegression
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import GridSearchCV, train_test_split
 from sklearn.preprocessing import LabelEncoder
-import pickle
+
+from flask_iris.model_registry import MODEL_FILE, file_version, model_registry
+
+METADATA_FILE = Path(__file__).parent.joinpath("model.json")
+IRIS_FILE = Path(__file__).parent.joinpath("data", "iris.csv")
+
+# Algorithms and the hyperparameters tried for each of them
+SEARCH_SPACE = {
+    "lr": (LogisticRegression(max_iter=1000), {"C": [0.01, 0.1, 1, 10, 100]}),
+    "dt": (DecisionTreeClassifier(random_state=42), {"max_depth": [2, 3, 4, 5, None],
+                                                     "min_samples_leaf": [1, 2, 5, 10]}),
+}
 
 
 def create_model(alg):
-    """Creates a model using the algorithm provided. Output serialised using pickle.
+    """Creates a model using the algorithm provided, if there is no saved model.
 
     Args:
     alg: either lr (LogisticRegression) or dt (DecisionTreeClassifier)
 
     Returns:
-    .pkl Pickled model
+    metadata of the new model, or None if there is already a saved model
+    """
+    if model_registry.model_file.exists():
+        return None
+    return train_models([alg])
+
+
+def train_models(algorithms=("lr", "dt"), cv=5, n_jobs=-1, model_file=MODEL_FILE, metadata_file=METADATA_FILE):
+    """Searches the hyperparameters of each algorithm, then saves the best model and its metadata.
 
+    Args:
+        algorithms: keys of SEARCH_SPACE to try, lr (LogisticRegression) and dt (DecisionTreeClassifier)
+        cv: number of cross-validation folds
+        n_jobs: number of CPU cores the search uses, -1 for all of them
+        model_file: path the model is saved to with joblib
+        metadata_file: path the JSON metadata is saved to
+
+    Returns:
+        metadata: dictionary with the version, algorithm, parameters, accuracy, features and timings of the model
     """
-    # Check if the model.pkl file exists
-    path_exists = Path.exists(Path(__file__).parent.joinpath("model.pkl"))
-
-    if not path_exists:
-        # Read the data into a DataFrame
-        iris_file = Path(__file__).parent.joinpath("data", "iris.csv")
-        df = pd.read_csv(iris_file)
-
-        # Convert categorical data to numeric
-        le = LabelEncoder()
-        df["species"] = le.fit_transform(df["species"])
-
-        # X = feature values (case sepal length, sepal width, petal length, petal width)
-        X = df.iloc[:, 0:-1]
-        X = X.values
-        # y = target values, last column of the data frame
-        y = df.iloc[:, -1]
-
-        # Split the data into 80% training and 20% testing (type of iris)
-        x_train, x_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.2, random_state=42
-        )
-
-        # Initialize the model
-        if alg == "dt":
-            model = DecisionTreeClassifier()
-        elif alg == "lr":
-            model = LogisticRegression()
-        else:
+    for alg in algorithms:
+        if alg not in SEARCH_SPACE:
             raise ValueError("Must provide either 'dt' (DecisionTree) or 'lr' (LogisticRegression)")
+    timings = {}
+    start = time.perf_counter()
+
+    # Read the data into a DataFrame
+    df = pd.read_csv(IRIS_FILE, encoding="utf-8-sig")
+
+    # Convert categorical data to numeric
+    le = LabelEncoder()
+    df["species"] = le.fit_transform(df["species"])
+
+    # X = feature values (case sepal length, sepal width, petal length, petal width)
+    features = list(df.columns[0:-1])
+    X = df[features].values
+    # y = target values, last column of the data frame
+    y = df.iloc[:, -1]
+
+    # Split the data into 80% training and 20% testing (type of iris)
+    x_train, x_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    timings["read_data"] = time.perf_counter() - start
+
+    # Search each algorithm with cross-validation on the training data, the folds run in parallel
+    searches = {}
+    for alg in algorithms:
+        search_start = time.perf_counter()
+        estimator, param_grid = SEARCH_SPACE[alg]
+        search = GridSearchCV(estimator, param_grid, cv=cv, n_jobs=n_jobs, scoring="accuracy")
+        search.fit(x_train, y_train)
+        searches[alg] = search
+        timings[f"search_{alg}"] = time.perf_counter() - search_start
+
+    best_alg = max(searches, key=lambda alg: searches[alg].best_score_)
+    best = searches[best_alg]
+    model = best.best_estimator_
+
+    # Save the model to a temporary file, uncompressed so its arrays can be memory-mapped
+    tmp_file = Path(f"{model_file}.{os.getpid()}.tmp")
+    joblib.dump(model, tmp_file)
+    metadata = {
+        # The same version as the app shows for the model, see model_registry.py
+        "version": file_version(tmp_file),
+        "algorithm": type(model).__name__,
+        "params": best.best_params_,
+        "cv_accuracy": best.best_score_,
+        "test_accuracy": model.score(x_test, y_test),
+        "candidates": {alg: search.best_score_ for alg, search in searches.items()},
+        # The order of the columns the model expects, and the species for each predicted label
+        "features": features,
+        "classes": [str(label) for label in le.classes_],
+        "trained_at": datetime.now(timezone.utc).isoformat(),
+        "sklearn_version": sklearn.__version__,
+        "timings": timings,
+    }
+    timings["total"] = time.perf_counter() - start
+    # Write the metadata first, then rename the model over the old one so the file is either the old or new model
+    metadata_tmp_file = Path(f"{metadata_file}.{os.getpid()}.tmp")
+    metadata_tmp_file.write_text(json.dumps(metadata, indent=2))
+    os.replace(metadata_tmp_file, metadata_file)
+    os.replace(tmp_file, model_file)
+    return metadata
+
 
-        # Train the model
-        model.fit(x_train, y_train)
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Train the iris model and save it to model.joblib")
+    parser.add_argument("--alg", nargs="+", default=["lr", "dt"], choices=list(SEARCH_SPACE),
+                        help="algorithms to try")
+    parser.add_argument("--cv", type=int, default=5, help="number of cross-validation folds")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="number of CPU cores to use, -1 for all")
+    args = parser.parse_args()
 
-        # Pickle the model and save current folder
-        pickle_file = Path(__file__).parent.joinpath("model.pkl")
-        pickle.dump(model, open(pickle_file, "wb"))
+    result = train_models(args.alg, cv=args.cv, n_jobs=args.n_jobs)
+    print(json.dumps(result, indent=2))
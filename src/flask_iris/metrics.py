@@ -0,0 +1,287 @@
+"""Measurements of the predictions made by the app, shown by GET /metrics.
+
+For each prediction endpoint the app records:
+
+- how long each part of a request takes, in a histogram for each stage: validating the input, getting the model from
+  the registry, and predicting. The results of /predict and /predict/csv are streamed after the view returns, so the
+  time taken to convert them to JSON or CSV is not included.
+- the number of requests, rejected requests and rows.
+
+For all the endpoints together it counts the predictions of each variety, and keeps a running mean, variance, minimum
+and maximum of each input feature. The mean and variance are updated with Welford's algorithm, combining a whole batch
+at a time, so no inputs are kept. The feature statistics are shown next to those of the training data (data/iris.csv),
+with the drift: the number of training standard deviations the mean of the inputs has moved from the training mean.
+
+Everything is kept in memory, so each worker process has its own measurements from when it started.
+"""
+import bisect
+import os
+import threading
+import time
+import weakref
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from flask_iris.batch import FEATURES, VARIETIES
+
+IRIS_FILE = Path(__file__).parent.joinpath("data", "iris.csv")
+
+# Upper bounds of the latency histogram buckets in milliseconds, the last bucket holds everything slower
+LATENCY_BUCKETS_MS = (0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+# Parts of a request that are timed, in the order they happen
+STAGES = ("validate", "lookup", "predict")
+
+
+class LatencyHistogram:
+    """Counts of durations in fixed buckets, from which the mean and percentiles can be estimated.
+
+    Args:
+        buckets_ms: upper bounds of the buckets in milliseconds, in increasing order
+    """
+
+    def __init__(self, buckets_ms=LATENCY_BUCKETS_MS):
+        self.buckets_ms = list(buckets_ms)
+        self.counts = [0] * (len(self.buckets_ms) + 1)
+        self.count = 0
+        self.sum_ms = 0.0
+
+    def observe(self, seconds):
+        """Adds a duration given in seconds."""
+        ms = seconds * 1000
+        self.counts[bisect.bisect_left(self.buckets_ms, ms)] += 1
+        self.count += 1
+        self.sum_ms += ms
+
+    def quantile(self, q):
+        """Returns an estimate of the q quantile in milliseconds, assuming the durations are spread evenly in a bucket.
+
+        Durations in the last bucket are shown as its lower bound, as it has no upper bound.
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = self.buckets_ms[i - 1] if i else 0.0
+                if i == len(self.buckets_ms):
+                    return lower
+                return lower + (self.buckets_ms[i] - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets_ms[-1]
+
+    def snapshot(self):
+        """Returns the count, mean, estimated percentiles and cumulative bucket counts as a dictionary."""
+        cumulative = np.cumsum(self.counts).tolist()
+        return {
+            "count": self.count,
+            "sum_ms": self.sum_ms,
+            "mean_ms": self.sum_ms / self.count if self.count else None,
+            "p50_ms": self.quantile(0.5),
+            "p90_ms": self.quantile(0.9),
+            "p99_ms": self.quantile(0.99),
+            # Number of durations less than or equal to each bound, as used by Prometheus
+            "buckets": [{"le_ms": le, "count": n} for le, n in zip(self.buckets_ms + ["+Inf"], cumulative)],
+        }
+
+
+class RunningStats:
+    """Mean, variance, minimum and maximum of each column of the rows seen so far, without keeping the rows.
+
+    Each batch is combined with the totals using the parallel form of Welford's algorithm, which stays accurate when
+    there are many rows, unlike keeping a sum of squares.
+
+    Args:
+        columns: number of columns in each row
+    """
+
+    def __init__(self, columns):
+        self.count = 0
+        self.mean = np.zeros(columns)
+        # Sum of the squared differences from the mean
+        self.m2 = np.zeros(columns)
+        self.min = np.full(columns, np.inf)
+        self.max = np.full(columns, -np.inf)
+
+    @classmethod
+    def of(cls, values):
+        """Returns the RunningStats of the rows of a 2D array."""
+        stats = cls(values.shape[1])
+        if len(values):
+            stats.count = len(values)
+            stats.mean = values.mean(axis=0)
+            stats.m2 = ((values - stats.mean) ** 2).sum(axis=0)
+            stats.min = values.min(axis=0)
+            stats.max = values.max(axis=0)
+        return stats
+
+    def update(self, values):
+        """Adds the rows of a 2D array."""
+        self.combine(RunningStats.of(values))
+
+    def combine(self, other):
+        """Adds the rows summarised by another RunningStats."""
+        if not other.count:
+            return
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * other.count / total
+        self.m2 = self.m2 + other.m2 + delta ** 2 * self.count * other.count / total
+        self.count = total
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+
+    @property
+    def variance(self):
+        """Sample variance of each column, NaN until there are two rows."""
+        if self.count < 2:
+            return np.full(len(self.mean), np.nan)
+        return self.m2 / (self.count - 1)
+
+
+class PredictionMetrics:
+    """Latency histograms, request counts, predicted variety counts and input feature statistics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.started_at = datetime.now(timezone.utc)
+        self.endpoints = {}
+        self.varieties = dict.fromkeys(VARIETIES.tolist(), 0)
+        self.features = RunningStats(len(FEATURES))
+
+    def record(self, endpoint, timer, values, varieties):
+        """Records a request that made predictions.
+
+        Args:
+            endpoint: name of the view, e.g. request.endpoint
+            timer: RequestTimer with the time taken by each stage
+            values: 2D array of the feature values that were predicted
+            varieties: array with the predicted variety name for each row
+        """
+        # Summarise the batch before taking the lock, so other requests only wait for it to be added
+        names, counts = np.unique(np.asarray(varieties), return_counts=True)
+        batch = RunningStats.of(np.asarray(values, dtype=np.float64))
+        with self._lock:
+            stats = self._endpoint(endpoint)
+            stats["requests"] += 1
+            stats["rows"] += len(values)
+            for stage, seconds in timer.laps.items():
+                stats["latency"][stage].observe(seconds)
+            stats["latency"]["total"].observe(timer.total)
+            for name, count in zip(names.tolist(), counts.tolist()):
+                self.varieties[name] = self.varieties.get(name, 0) + count
+            self.features.combine(batch)
+
+    def record_error(self, endpoint):
+        """Records a request that was rejected because its input was not valid."""
+        with self._lock:
+            self._endpoint(endpoint)["errors"] += 1
+
+    def _endpoint(self, endpoint):
+        if endpoint not in self.endpoints:
+            self.endpoints[endpoint] = {
+                "requests": 0,
+                "errors": 0,
+                "rows": 0,
+                "latency": {stage: LatencyHistogram() for stage in STAGES + ("total",)},
+            }
+        return self.endpoints[endpoint]
+
+    def snapshot(self):
+        """Returns all the measurements as a dictionary that can be returned as JSON."""
+        reference = training_stats()
+        with self._lock:
+            endpoints = {
+                name: {
+                    "requests": stats["requests"],
+                    "errors": stats["errors"],
+                    "rows": stats["rows"],
+                    "latency": {stage: h.snapshot() for stage, h in stats["latency"].items()},
+                }
+                for name, stats in self.endpoints.items()
+            }
+            features = {}
+            std = np.sqrt(self.features.variance)
+            ref_std = np.sqrt(reference.variance)
+            drift = (self.features.mean - reference.mean) / ref_std
+            for i, feature in enumerate(FEATURES):
+                seen = self.features.count > 0
+                features[feature] = {
+                    "count": self.features.count,
+                    "mean": float(self.features.mean[i]) if seen else None,
+                    "std": float(std[i]) if self.features.count > 1 else None,
+                    "min": float(self.features.min[i]) if seen else None,
+                    "max": float(self.features.max[i]) if seen else None,
+                    "training_mean": float(reference.mean[i]),
+                    "training_std": float(ref_std[i]),
+                    "drift": float(drift[i]) if seen else None,
+                }
+            return {
+                "started_at": self.started_at.isoformat(),
+                "pid": os.getpid(),
+                "endpoints": endpoints,
+                "predictions": dict(self.varieties),
+                "features": features,
+            }
+
+    def _after_fork(self):
+        """A forked worker starts with no measurements of its own, rather than a copy of the parent's."""
+        self._lock = threading.Lock()
+        self._reset()
+
+
+class RequestTimer:
+    """Times the stages of a request, each call to lap() records the time since the previous one."""
+
+    def __init__(self):
+        self.start = self._last = time.perf_counter()
+        self.laps = {}
+
+    def lap(self, stage):
+        """Records the time since the timer started or the last lap as the time taken by the stage."""
+        now = time.perf_counter()
+        self.laps[stage] = now - self._last
+        self._last = now
+
+    @property
+    def total(self):
+        """Seconds from the start to the last lap."""
+        return self._last - self.start
+
+
+@lru_cache(maxsize=1)
+def training_stats():
+    """Returns the RunningStats of the features of the training data, to compare the inputs with."""
+    df = pd.read_csv(IRIS_FILE, encoding="utf-8-sig")
+    stats = RunningStats(len(FEATURES))
+    stats.update(df[FEATURES].to_numpy(dtype=np.float64))
+    return stats
+
+
+# Metrics made by create_metrics(), so a forked worker can reset them
+_all_metrics = weakref.WeakSet()
+
+
+def reset_metrics_after_fork():
+    """A forked worker starts with no measurements of its own, rather than a copy of the parent's."""
+    for metrics in list(_all_metrics):
+        metrics._after_fork()
+
+
+# Registered once, however many apps are created
+os.register_at_fork(after_in_child=reset_metrics_after_fork)
+
+
+def create_metrics():
+    """Returns a PredictionMetrics that is reset in each forked worker."""
+    metrics = PredictionMetrics()
+    _all_metrics.add(metrics)
+    return metrics
@@ -0,0 +1,196 @@
+"""Keeps the trained model in memory so that it is not read from model.pkl for every prediction.
+
+The model is loaded the first time it is needed. After that the registry checks the modification time and size of
+model.pkl, at most once every check_interval seconds. When they change the file is hashed, and if the contents have
+changed the new model is loaded and replaces the old one. A running server therefore picks up a retrained model
+without a restart.
+
+The loaded model and its details are replaced together in one assignment, so a request always gets a model and the
+version that belongs to it, even while another thread is loading a new model. The file is hashed and then loaded, so
+if it is replaced in between it is hashed and loaded again.
+
+Models are saved by create_ml_model.py as model.joblib, an uncompressed joblib file which is loaded with
+mmap_mode="r". The NumPy arrays in the model, e.g. the coefficients of a linear model, are then memory-mapped from the
+file rather than copied into memory, so all the worker processes share one copy through the OS page cache. The older
+model.pkl is used if there is no model.joblib.
+
+Usage:
+    from flask_iris.model_registry import model_registry
+    model = model_registry.get_model()
+"""
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+from pathlib import Path
+
+import joblib
+
+logger = logging.getLogger(__name__)
+
+MODEL_FILE = Path(__file__).parent.joinpath("model.joblib")
+# Model saved with pickle by earlier versions of create_ml_model.py
+PICKLE_MODEL_FILE = Path(__file__).parent.joinpath("model.pkl")
+
+# A loaded model and the details of the file it was loaded from
+LoadedModel = namedtuple("LoadedModel",
+                         ["model", "version", "file", "inode", "mtime_ns", "size", "loaded_at", "load_seconds"])
+
+
+class ModelRegistry:
+    """Loads a saved model once and reloads it when the file changes.
+
+    Args:
+        model_files: paths the model is loaded from, the first one that exists is used. A .joblib file is
+            memory-mapped, any other file is unpickled.
+        check_interval: minimum number of seconds between checks of the file for changes
+    """
+
+    def __init__(self, model_files=(MODEL_FILE, PICKLE_MODEL_FILE), check_interval=1.0):
+        if isinstance(model_files, (str, Path)):
+            model_files = [model_files]
+        self.model_files = [Path(f) for f in model_files]
+        self.check_interval = check_interval
+        self._loaded = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def get_model(self):
+        """Returns the model, loading it if it has not been loaded or if the file has changed.
+
+        Returns:
+            the unpickled model
+
+        Raises:
+            FileNotFoundError: if the model has never been loaded and none of the files exist
+        """
+        return self.get_loaded().model
+
+    def get_loaded(self):
+        """Returns the LoadedModel with the model and its version, loading it if needed."""
+        loaded = self._loaded
+        if loaded is None or time.monotonic() >= self._next_check:
+            loaded = self._check()
+        return loaded
+
+    @property
+    def version(self):
+        """First 12 characters of the SHA-256 hash of the loaded model file, or None if no model is loaded."""
+        return self._loaded.version if self._loaded else None
+
+    @property
+    def model_file(self):
+        """Path of the file the model is loaded from, the first of the model_files that exists."""
+        for model_file in self.model_files:
+            if model_file.exists():
+                return model_file
+        return self.model_files[0]
+
+    def info(self):
+        """Returns the details of the loaded model as a dictionary, e.g. for a status page.
+
+        The metadata saved by create_ml_model.py, such as the accuracy, is included if it is for the loaded model.
+        """
+        loaded = self.get_loaded()
+        info = {
+            "file": str(loaded.file),
+            "version": loaded.version,
+            "loaded_at": loaded.loaded_at.isoformat(),
+            "load_seconds": loaded.load_seconds,
+        }
+        try:
+            metadata = json.loads(loaded.file.with_suffix(".json").read_text())
+        except (OSError, ValueError):
+            metadata = None
+        if metadata and metadata.get("version") == loaded.version:
+            info["metadata"] = metadata
+        return info
+
+    def reload(self):
+        """Loads the model from the file now, even if the file does not appear to have changed."""
+        with self._lock:
+            model_file = self.model_file
+            self._loaded = self._load(model_file, model_file.stat())
+            self._next_check = time.monotonic() + self.check_interval
+            return self._loaded
+
+    def _check(self):
+        with self._lock:
+            # Another thread may have checked while this one waited for the lock
+            loaded = self._loaded
+            if loaded is not None and time.monotonic() < self._next_check:
+                return loaded
+            model_file = self.model_file
+            try:
+                stat = model_file.stat()
+                if loaded is None:
+                    self._loaded = self._load(model_file, stat)
+                # The inode changes when create_ml_model.py replaces the file, even within one tick of the clock
+                elif _file_key(model_file, stat) != (loaded.file, loaded.inode, loaded.mtime_ns, loaded.size):
+                    self._loaded = self._load(model_file, stat, loaded)
+            except (OSError, pickle.UnpicklingError, EOFError, ValueError, AttributeError, ImportError) as e:
+                if loaded is None:
+                    raise
+                # Keep using the model that is loaded, e.g. if the new file is still being written
+                logger.warning(f"Could not reload the model from {model_file}, using version {loaded.version}. "
+                               f"Error: {e}")
+            self._next_check = time.monotonic() + self.check_interval
+            return self._loaded
+
+    def _load(self, model_file, stat, current=None):
+        """Loads the file, or keeps the current model if the file contents are the same."""
+        start = time.perf_counter()
+        while True:
+            version = file_version(model_file)
+            if current is not None and version == current.version:
+                # Only the modification time changed, e.g. the same model was saved again
+                return current._replace(file=model_file, inode=stat.st_ino, mtime_ns=stat.st_mtime_ns,
+                                        size=stat.st_size)
+            model = load_model(model_file)
+            # If the file was replaced while it was hashed or loaded, the model may not be the one that was hashed
+            loaded_stat = model_file.stat()
+            if _file_key(model_file, loaded_stat) == _file_key(model_file, stat):
+                break
+            stat = loaded_stat
+        loaded = LoadedModel(model=model, version=version, file=model_file, inode=stat.st_ino,
+                             mtime_ns=stat.st_mtime_ns, size=stat.st_size, loaded_at=datetime.now(timezone.utc),
+                             load_seconds=time.perf_counter() - start)
+        logger.info(f"Loaded model version {version} from {model_file} in {loaded.load_seconds:.3f}s")
+        return loaded
+
+    def _after_fork(self):
+        """A forked worker keeps the loaded model, but needs a new lock as the parent's may be held."""
+        self._lock = threading.Lock()
+
+
+def _file_key(model_file, stat):
+    """The path, inode, modification time and size of a model file, which change when the file is replaced."""
+    return model_file, stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def load_model(model_file):
+    """Loads a model, memory-mapping the arrays of a .joblib file and unpickling any other file."""
+    model_file = Path(model_file)
+    if model_file.suffix == ".joblib":
+        return joblib.load(model_file, mmap_mode="r")
+    with open(model_file, "rb") as f:
+        return pickle.load(f)
+
+
+def file_version(model_file):
+    """Returns the first 12 characters of the SHA-256 hash of a file, read in blocks so it is not all in memory."""
+    digest = hashlib.sha256()
+    with open(model_file, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+# Registry shared by all requests in a process
+model_registry = ModelRegistry()
+os.register_at_fork(after_in_child=model_registry._after_fork)
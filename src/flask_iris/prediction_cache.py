@@ -0,0 +1,85 @@
+"""Cache of single flower predictions.
+
+The form fields step in 0.1 cm, so the same few measurements are submitted again and again. The cache keeps the most
+recently used predictions keyed on the model version and the measurements rounded to the form's precision, so a
+repeated input is answered without calling the model.
+
+The measurements are rounded before the prediction is made, so a key always has the same prediction. When the model
+file changes the model version changes too, and the cache is emptied the first time the new version is used.
+
+Set PREDICTION_CACHE_SIZE in the config to change the number of predictions kept, or to 0 to turn the cache off.
+"""
+import threading
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """Least recently used cache of predictions with hit and miss counts.
+
+    Args:
+        maxsize: largest number of predictions kept
+        decimals: number of decimal places the measurements are rounded to
+    """
+
+    def __init__(self, maxsize=4096, decimals=1):
+        self.maxsize = maxsize
+        self.decimals = decimals
+        self._cache = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def quantize(self, row):
+        """Returns the measurements rounded to the cache precision as a tuple."""
+        return tuple(round(float(value), self.decimals) for value in row)
+
+    def get_or_predict(self, row, version, predict_fn):
+        """Returns the cached prediction for the row, or predicts it and adds it to the cache.
+
+        Args:
+            row: list of the feature values for one flower
+            version: version of the model that will make the prediction
+            predict_fn: function that takes a list of feature values and returns the prediction
+
+        Returns:
+            the prediction for the rounded row
+        """
+        key = self.quantize(row)
+        with self._lock:
+            if version != self._version:
+                # The model has changed, so the cached predictions may no longer be right
+                self._cache.clear()
+                self._version = version
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+            self.misses += 1
+        # Predict without the lock so other requests are not held up by the model
+        prediction = predict_fn(list(key))
+        with self._lock:
+            if version == self._version:
+                self._cache[key] = prediction
+                if len(self._cache) > self.maxsize:
+                    self._cache.popitem(last=False)
+        return prediction
+
+    def clear(self):
+        """Removes all predictions and resets the statistics."""
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Returns the hits, misses, hit rate and size of the cache as a dictionary."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else None,
+                "size": len(self._cache),
+                "maxsize": self.maxsize,
+            }
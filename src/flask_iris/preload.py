@@ -0,0 +1,68 @@
+"""Loads and warms up the model while the app is created, before a server forks its worker processes.
+
+Without this each worker loads the model the first time it is asked for a prediction, so the first request to every
+worker is slow, and each worker ends up with its own copy of the model. With PRELOAD_MODEL = True in the config,
+create_app() instead:
+
+1. loads the model into the registry,
+2. checks it by predicting a few known flowers, so a broken model stops the app starting rather than failing requests,
+3. makes the predictions with both the single flower and the batch code, so the modules sklearn imports on first use
+   are already imported,
+4. runs the garbage collector and then freezes every object that exists with gc.freeze().
+
+A forked worker shares the parent's memory until it writes to a page. Python's garbage collector writes to every object
+it examines, so a collection in a worker would copy the pages holding the model and the imported modules. Frozen
+objects are never examined, so the pages stay shared.
+
+The server must create the app before it forks for the workers to share it, e.g. with gunicorn's --preload option:
+
+    gunicorn --preload -w 4 "flask_iris:create_app()"
+"""
+import gc
+import time
+
+import numpy as np
+
+from flask_iris.batch import VARIETIES, predict_batch
+from flask_iris.model_registry import model_registry
+
+# Flowers from the iris data set and their species, used to check the model
+SAMPLE_ROWS = np.array([[5.1, 3.5, 1.4, 0.2], [5.9, 3.0, 4.2, 1.5], [6.9, 3.1, 5.4, 2.1]])
+SAMPLE_VARIETIES = ["iris-setosa", "iris-versicolor", "iris-virginica"]
+
+
+def preload_model(app):
+    """Loads, checks and warms up the model, then freezes the objects in memory so forked workers share them.
+
+    Args:
+        app: the Flask app, after the routes have been imported
+
+    Returns:
+        number of seconds taken
+
+    Raises:
+        ValueError: if the model does not return a variety and a probability for each variety for each row
+    """
+    start = time.perf_counter()
+    loaded = model_registry.reload()
+
+    # The batch code path, with the probabilities
+    varieties, probs = predict_batch(SAMPLE_ROWS, probabilities=True)
+    if probs.shape != (len(SAMPLE_ROWS), len(VARIETIES)) or not np.allclose(probs.sum(axis=1), 1):
+        raise ValueError(f"Model {loaded.version} in {loaded.file} does not predict a probability for each of "
+                         f"{VARIETIES.tolist()}")
+    if varieties.tolist() != SAMPLE_VARIETIES:
+        app.logger.warning(f"Model {loaded.version} predicts {varieties.tolist()} for the sample flowers, "
+                           f"expected {SAMPLE_VARIETIES}")
+
+    # The single flower code path, directly rather than through the coalescer or cache so no thread is started and
+    # nothing is cached before the fork
+    model = model_registry.get_model()
+    model.predict(np.asarray(SAMPLE_ROWS[:1].tolist(), dtype=float))
+
+    # Collect the garbage left by loading, then move everything that is left out of the collector's reach
+    gc.collect()
+    gc.freeze()
+    seconds = time.perf_counter() - start
+    app.logger.info(f"Preloaded model {loaded.version} in {seconds:.3f}s, froze {gc.get_freeze_count()} objects")
+    return seconds
@@ -1,16 +1,20 @@
-from pathlib import Path
-import pickle
-from flask import render_template, current_app as app
+from flask import render_template, current_app as app, request, make_response, Response
 import numpy as np
+from flask_iris.batch import VARIETIES, to_feature_array, read_csv_features, predict_batch, iter_json, iter_csv
 from flask_iris.forms import PredictionForm
+from flask_iris.metrics import RequestTimer
+from flask_iris.model_registry import model_registry
 
 
 @app.route("/", methods=["GET", "POST"])
 def index():
     """Create the homepage"""
     form = PredictionForm()
+    metrics = app.extensions["prediction_metrics"]
+    timer = RequestTimer()
 
     if form.validate_on_submit():
+        timer.lap("validate")
         # Get all values from the form
         features_from_form = [
             form.sepal_length.data,
@@ -20,16 +24,119 @@ def index():
         ]
 
         # Make the prediction
+        model_registry.get_loaded()
+        timer.lap("lookup")
         prediction = make_prediction(features_from_form)
+        timer.lap("predict")
+        metrics.record(request.endpoint, timer, [features_from_form], [prediction])
 
         prediction_text = f"Predicted Iris type: {prediction}"
 
         return render_template(
             "index.html", form=form, prediction_text=prediction_text
         )
+    if form.is_submitted():
+        metrics.record_error(request.endpoint)
     return render_template("index.html", form=form)
 
 
+@app.route("/model")
+def model_info():
+    """Returns the version of the model in use, when it was loaded and the prediction cache statistics in JSON"""
+    info = model_registry.info()
+    cache = app.extensions.get("prediction_cache")
+    if cache is not None:
+        info["prediction_cache"] = cache.stats()
+    return info
+
+
+@app.route("/metrics")
+def metrics_info():
+    """Returns the latency of each stage of the prediction requests, the number of predictions of each variety and
+    statistics of the input features in JSON, with the version of the model in use. See metrics.py."""
+    return {
+        "model_version": model_registry.version,
+        **app.extensions["prediction_metrics"].snapshot(),
+    }
+
+
+@app.post("/predict")
+def predict():
+    """Predicts the variety of many flowers sent as JSON.
+
+    The request body is {"rows": [...], "probabilities": false} where each row is either a list of the sepal length,
+    sepal width, petal length and petal width, or an object with those keys e.g. {"sepal_length": 5.1, ...}.
+    The body can also be just the list of rows.
+
+    Returns:
+        JSON with the model version and a prediction for each row in the same order as the rows, streamed as it is
+        created. 400 if the rows are not valid or probabilities is not a JSON boolean.
+    """
+    metrics = app.extensions["prediction_metrics"]
+    timer = RequestTimer()
+    body = request.get_json(silent=True)
+    if isinstance(body, dict):
+        rows = body.get("rows")
+        probabilities = body.get("probabilities", False)
+        # Only a JSON true or false, bool("false") would be True
+        if not isinstance(probabilities, bool):
+            metrics.record_error(request.endpoint)
+            return make_response({"message": "probabilities must be true or false"}, 400)
+    else:
+        rows = body
+        probabilities = request.args.get("probabilities", "false").lower() == "true"
+    try:
+        values = to_feature_array(rows)
+    except ValueError as e:
+        metrics.record_error(request.endpoint)
+        return make_response({"message": str(e)}, 400)
+    timer.lap("validate")
+    loaded = model_registry.get_loaded()
+    timer.lap("lookup")
+    varieties, probs = predict_batch(values, probabilities, loaded.model)
+    timer.lap("predict")
+    metrics.record(request.endpoint, timer, values, varieties)
+    return Response(iter_json(varieties, probs, loaded.version), mimetype="application/json")
+
+
+@app.post("/predict/csv")
+def predict_csv():
+    """Predicts the variety of each row of an uploaded CSV file.
+
+    Upload the file in a form field called 'file', or send the CSV as the request body with the text/csv content type.
+    The file needs a header row with the columns sepal_length, sepal_width, petal_length and petal_width. Add
+    ?probabilities=true to the URL to include the probability of each variety.
+
+    Returns:
+        CSV with the feature columns and the predicted variety for each row, streamed as it is created.
+        400 if the file is missing or not valid.
+    """
+    metrics = app.extensions["prediction_metrics"]
+    timer = RequestTimer()
+    file = request.files.get("file")
+    if file is None:
+        if not request.content_length:
+            metrics.record_error(request.endpoint)
+            return make_response({"message": "Upload a CSV file in the 'file' field"}, 400)
+        file = request.stream
+    try:
+        values = read_csv_features(file)
+    except ValueError as e:
+        metrics.record_error(request.endpoint)
+        return make_response({"message": str(e)}, 400)
+    probabilities = request.args.get("probabilities", "false").lower() == "true"
+    timer.lap("validate")
+    loaded = model_registry.get_loaded()
+    timer.lap("lookup")
+    varieties, probs = predict_batch(values, probabilities, loaded.model)
+    timer.lap("predict")
+    metrics.record(request.endpoint, timer, values, varieties)
+    response = Response(iter_csv(values, varieties, probs), mimetype="text/csv")
+    response.headers["Content-Disposition"] = "attachment; filename=predictions.csv"
+    response.headers["X-Model-Version"] = loaded.version
+    return response
+
+
 def make_prediction(flower_values):
     """Takes the flower values, makes a model using the prediction and returns a string of the predicted flower variety
 
@@ -45,18 +152,29 @@ def make_prediction(flower_values):
     Returns:
     variety (str): Name of the predicted iris variety
     """
+    # Repeated measurements are answered from the cache of predictions made by the current model version
+    cache = app.extensions.get("prediction_cache")
+    if cache is not None:
+        return cache.get_or_predict(flower_values, model_registry.get_loaded().version, predict_one)
+    return predict_one(flower_values)
+
+
+def predict_one(flower_values):
+    """Predicts the variety of one flower with the model, see make_prediction()"""
+    # If the coalescer is turned on the row is predicted together with rows from other requests
+    coalescer = app.extensions.get("prediction_coalescer")
+    if coalescer is not None:
+        return coalescer.predict(flower_values)
 
     # Convert to a 2D numpy array with float values, needed as input to the model
     input_values = np.asarray([flower_values], dtype=float)
 
-    # Get a prediction from the model
-    pickle_file = Path(__file__).parent.joinpath("model.pkl")
-    model = pickle.load(open(pickle_file, "rb"))
+    # Get a prediction from the model, which is loaded once and kept in memory until model.pkl changes
+    model = model_registry.get_model()
     prediction = model.predict(input_values)
 
     # convert the prediction to the variety name
-    varieties = {0: "iris-setosa", 1: "iris-versicolor", 2: "iris-virginica"}
-    variety = np.vectorize(varieties.__getitem__)(prediction[0])
+    variety = VARIETIES[prediction[0]]
 
     return variety
 
@@ -0,0 +1,89 @@
+"""Background callback manager shared by the Dash apps.
+
+Dash runs a normal callback inside the web worker that received the request, so a slow figure build or REST API
+request blocks that worker for every user. A callback with background=True is run in a separate process by the
+manager instead, and the web worker only polls for the result.
+
+The diskcache manager needs no other services. It runs each job in a local process and stores the results in a
+folder on disk. When a background callback is triggered again before the previous job has finished, Dash terminates
+the previous job.
+
+Only use it for work that takes long enough that forking a process is worth it, e.g. several seconds. The browser polls
+for the result every interval milliseconds, 1000 by default, so a background callback never returns sooner than its
+first poll. Give it a short interval and a cancel input, e.g.
+
+    @app.callback(Output(...), Input("run", "n_clicks"), background=True, interval=200,
+                  cancel=[Input("cancel", "n_clicks")])
+
+A job runs in a forked process, so anything it caches in memory is lost when it ends.
+
+Whether a callback is slow can depend on how the app is run, e.g. a card is quick to build on the combined server
+(paralympics_server) but needs a request over the network otherwise. optional_background_callback() registers a
+callback that runs in the background only when it is slow.
+
+See https://dash.plotly.com/background-callbacks
+"""
+import os
+from pathlib import Path
+
+import diskcache
+from dash import DiskcacheManager
+
+# Folder where the job results are stored, can be changed with the DASH_CACHE_DIR environment variable
+CACHE_DIR = Path(os.environ.get("DASH_CACHE_DIR", Path(__file__).parent.parent.parent.joinpath(".dash_cache")))
+
+# Number of seconds the result of a job is kept
+RESULT_EXPIRE = 300
+
+# Milliseconds between the browser's polls for the progress and result of a job
+POLL_INTERVAL = 200
+
+
+def background_callback_manager(cache_dir=CACHE_DIR):
+    """Returns a diskcache manager to pass to Dash(background_callback_manager=...).
+
+    Args:
+        cache_dir: folder where the job results are stored
+
+    Returns:
+        manager: dash.DiskcacheManager
+    """
+    cache = diskcache.Cache(str(cache_dir))
+    return DiskcacheManager(cache, expire=RESULT_EXPIRE)
+
+
+def optional_background_callback(app, *args, background, progress, cancel=None, interval=POLL_INTERVAL, **kwargs):
+    """Registers a callback that runs in the background if background is True, otherwise in the web worker.
+
+    The callback takes a set_progress function as its first argument, as a background callback with progress outputs
+    does. In the web worker it is passed a function that does nothing, as the progress could not be shown before the
+    callback returns anyway.
+
+    Args:
+        app: the Dash app
+        args: outputs and inputs of the callback, as passed to app.callback()
+        background: True to run the callback in a background job
+        progress: Output or list of Outputs set by set_progress() while the job runs
+        cancel: Input or list of Inputs that cancel the running job when they change, if any
+        interval: milliseconds between the browser's polls for the progress and result of the job
+        kwargs: other keyword arguments for app.callback(), e.g. running
+
+    Returns:
+        decorator: registers the function as the callback and returns it unchanged
+    """
+
+    def decorator(func):
+        if background:
+            app.callback(*args, background=True, interval=interval, progress=progress, cancel=cancel, **kwargs)(func)
+        else:
+            def run_in_worker(*values):
+                return func(_no_progress, *values)
+
+            app.callback(*args, **kwargs)(run_in_worker)
+        return func
+
+    return decorator
+
+
+def _no_progress(*values):
+    pass
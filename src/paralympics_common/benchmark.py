@@ -0,0 +1,113 @@
+"""Measures the time and memory to load the events data from the CSV file and from its columnar copy.
+
+The events file is copied to a temporary folder at its own size and repeated 10,000 times, so the difference between
+the two ways of reading it can be seen for a file of a realistic size and one much larger. Each load is measured in a
+new process, after loading a small file the same way so that the libraries are already imported, and nothing else is
+shared or cached between them:
+
+- csv: pandas.read_csv(), with usecols when only some of the columns are read
+- feather: read_columnar(), the memory-mapped Feather copy made by columnar.py, created before the process starts
+
+For each load the benchmark reports:
+
+- first load: time of the first read in the process, which includes checking the columnar copy is up-to-date
+- repeat load: mean time of the reads after the first
+- peak RSS: how much the peak resident memory of the process grew while the data was read. It is measured with the
+  resource module, so the benchmark only runs on Linux and macOS.
+
+To run the benchmark:
+
+    python -m paralympics_common.benchmark
+"""
+import multiprocessing
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Times the events file is repeated
+SCALES = (1, 10_000)
+
+# The columns read by the line chart, or None for all the columns
+COLUMN_SETS = {"4 columns": ["type", "year", "host", "sports"], "all columns": None}
+
+WARM_UP_FILE = "warm_up.csv"
+
+
+def run(scales=SCALES, repeats=10):
+    """Prints the load times and memory for each scale, set of columns and way of reading the file."""
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as folder:
+        # The files are made in another process, as a new process starts with the peak RSS of the one that started it
+        prepare = context.Process(target=_prepare, args=(folder, scales))
+        prepare.start()
+        prepare.join()
+        print(f"{'scale':>7} {'rows':>9} {'columns':>12} {'method':>8} {'first load ms':>14} {'repeat load ms':>15} "
+              f"{'peak RSS MB':>12}")
+        for scale in scales:
+            csv_file = Path(folder).joinpath(f"events_{scale}x.csv")
+            for columns_name, columns in COLUMN_SETS.items():
+                for method in ("csv", "feather"):
+                    results = context.Queue()
+                    process = context.Process(target=_measure, args=(method, csv_file, columns, repeats, results))
+                    process.start()
+                    rows, first, repeat, rss = results.get()
+                    process.join()
+                    print(f"{scale:>7} {rows:>9} {columns_name:>12} {method:>8} {first * 1000:>14.2f} "
+                          f"{repeat * 1000:>15.2f} {rss / 1e6:>12.1f}")
+
+
+def _prepare(folder, scales):
+    """Writes the events file repeated for each scale to the folder, and its columnar copy."""
+    import pandas as pd
+
+    from paralympics_common import columnar
+
+    df_events = pd.read_csv(columnar.DATA_DIR.joinpath("paralympic_events.csv"))
+    # Create the columnar copies in the folder, so the feather loads do not include writing them
+    columnar.COLUMNAR_DIR = Path(folder)
+    # The warm up file is loaded before each measurement, so the modules pandas and pyarrow import on first use are
+    # not counted
+    files = {f"events_{scale}x.csv": pd.concat([df_events] * scale, ignore_index=True) for scale in scales}
+    files[WARM_UP_FILE] = df_events.head(2)
+    for name, df in files.items():
+        csv_file = Path(folder).joinpath(name)
+        df.to_csv(csv_file, index=False)
+        columnar.read_columnar(csv_file.stem, csv_file, lambda: pd.read_csv(csv_file))
+
+
+def _measure(method, csv_file, columns, repeats, results):
+    """Loads the file with the method and sends the number of rows, the timings and the peak RSS growth to results."""
+    import pandas as pd
+
+    from paralympics_common import columnar
+
+    columnar.COLUMNAR_DIR = csv_file.parent
+
+    def load(f):
+        if method == "csv":
+            return pd.read_csv(f, usecols=columns)
+        return columnar.read_columnar(f.stem, f, lambda: pd.read_csv(f), columns)
+
+    load(csv_file.with_name(WARM_UP_FILE))
+    baseline = _peak_rss()
+    start = time.perf_counter()
+    df = load(csv_file)
+    first = time.perf_counter() - start
+    rss = _peak_rss() - baseline
+    start = time.perf_counter()
+    for _ in range(repeats):
+        load(csv_file)
+    repeat = (time.perf_counter() - start) / repeats
+    results.put((len(df), first, repeat, rss))
+
+
+def _peak_rss():
+    """Returns the peak resident memory of the process in bytes, ru_maxrss is in KiB on Linux and bytes on macOS."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,105 @@
+"""Columnar copies of the CSV files in the data folder.
+
+Parsing a CSV file means converting every value from text, even when a figure only needs a few of the columns. This
+module keeps a Feather (Arrow IPC) copy of each CSV file in data/.columnar. The copy is typed, uncompressed and
+memory-mapped when it is read, so reading a subset of the columns only touches the pages of those columns.
+
+The copy is created the first time a file is read, and created again whenever the CSV file is changed. Other source
+files, such as the medals workbook, can be cached the same way with read_columnar().
+
+Usage:
+    from paralympics_common.columnar import read_data
+    df = read_data("paralympic_events", columns=["type", "year", "host", "sports"])
+"""
+import os
+import threading
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+from pyarrow import feather
+
+DATA_DIR = Path(__file__).parent.parent.parent.joinpath("data")
+COLUMNAR_DIR = DATA_DIR.joinpath(".columnar")
+
+# Options for pandas.read_csv() for files that need more than the defaults
+READ_CSV_OPTIONS = {
+    # 'NA' is the NOC code for Namibia so only empty values are missing
+    "noc_regions": {"keep_default_na": False, "na_values": [""]},
+}
+
+# Key in the Feather schema metadata that records the source file the copy was made from
+_SOURCE_KEY = b"source_signature"
+
+_lock = threading.Lock()
+# Name of each copy that is known to be up-to-date: signature of its source file
+_checked = {}
+
+
+def read_data(name, columns=None):
+    """Returns the data from data/<name>.csv as a pandas DataFrame, read from its columnar copy.
+
+    Args:
+        name: name of the CSV file without the .csv extension, e.g. paralympic_events
+        columns: list of the columns to read, or None for all columns
+
+    Returns:
+        df: pandas DataFrame
+    """
+    csv_file = DATA_DIR.joinpath(f"{name}.csv")
+    return read_columnar(name, csv_file, lambda: pd.read_csv(csv_file, **READ_CSV_OPTIONS.get(name, {})), columns)
+
+
+def read_columnar(name, source_file, reader, columns=None, version=1):
+    """Returns the data from any source file as a pandas DataFrame, read from its columnar copy.
+
+    Args:
+        name: name of the columnar copy, must be unique for each source file
+        source_file: path of the file the data is read from, the copy is created again when it changes
+        reader: function with no arguments that reads the source file and returns a pandas DataFrame
+        columns: list of the columns to read, or None for all columns
+        version: change this when the reader changes, so that copies made by the previous reader are replaced
+
+    Returns:
+        df: pandas DataFrame
+    """
+    table = feather.read_table(columnar_file(name, source_file, reader, version), columns=columns, memory_map=True)
+    return table.to_pandas()
+
+
+def columnar_file(name, source_file, reader, version=1):
+    """Returns the path of the Feather copy of the source file, creating it if it is missing or out of date."""
+    feather_file = COLUMNAR_DIR.joinpath(f"{name}.feather")
+    signature = _signature(source_file, version)
+    if _checked.get(name) == signature:
+        return feather_file
+    with _lock:
+        if _read_signature(feather_file) != signature:
+            _write_copy(reader(), feather_file, signature)
+        _checked[name] = signature
+    return feather_file
+
+
+def _signature(source_file, version):
+    stat = Path(source_file).stat()
+    return f"{version}:{stat.st_mtime_ns}:{stat.st_size}".encode()
+
+
+def _read_signature(feather_file):
+    """Returns the signature of the source file the copy was made from, or None if there is no copy."""
+    try:
+        with pa.memory_map(str(feather_file)) as source:
+            metadata = pa.ipc.open_file(source).schema.metadata or {}
+    except (FileNotFoundError, pa.ArrowInvalid):
+        return None
+    return metadata.get(_SOURCE_KEY)
+
+
+def _write_copy(df, feather_file, signature):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), _SOURCE_KEY: signature})
+    COLUMNAR_DIR.mkdir(exist_ok=True)
+    # Write to a temporary file and then rename it, so a process reading the copy never sees a partly written file
+    tmp_file = feather_file.with_suffix(f".{os.getpid()}.tmp")
+    feather.write_feather(table, tmp_file, compression="uncompressed")
+    os.replace(tmp_file, feather_file)
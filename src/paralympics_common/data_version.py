@@ -0,0 +1,119 @@
+"""Version number of the data shown by the Dash apps.
+
+Page layouts and figures are cached until the data they were built from changes. The version changes when any of the
+data files is modified, or when bump_data_version() is called, e.g. after the data is changed through the REST API.
+
+A SQLite database in WAL journal mode does not write to the database file when a change is committed, only to the
+-wal file next to it, so the modification time and size of both files are part of the version. For a SQLite database
+use get_database_version() instead, which asks SQLite whether a commit has been made, see below.
+"""
+import os
+import sqlite3
+import threading
+import weakref
+from pathlib import Path
+
+from sqlalchemy import event
+
+_lock = threading.Lock()
+_version = 0
+
+# Number of commits made through each engine passed to get_database_version()
+_commits = weakref.WeakKeyDictionary()
+
+# Process id and connection used only to read PRAGMA data_version, for each SQLite database file
+_watchers = {}
+
+
+def get_data_version(*files):
+    """Returns a value that changes whenever the data changes.
+
+    Args:
+        files: paths of the data files the caller reads, their modification times and sizes are part of the version
+
+    Returns:
+        version: tuple to use as a cache key
+    """
+    stats = tuple(value for f in files for value in _file_stats(f))
+    return (_version,) + stats
+
+
+def get_database_version(engine):
+    """Returns a value that changes whenever the data in a database changes.
+
+    For a SQLite database file the version includes PRAGMA data_version, read from a connection kept for the purpose.
+    SQLite changes it once a commit by any other connection, in this or another process, can be read. A cache key made
+    before a query therefore never hides data committed after the query. The modification times are included too, in
+    case the file is replaced.
+
+    For any other database the commits made through the engine are counted, so changes made by other processes are
+    not seen.
+
+    Args:
+        engine: SQLAlchemy engine of the database
+
+    Returns:
+        version: tuple to use as a cache key
+    """
+    database = engine.url.database
+    if engine.dialect.name == "sqlite" and database and database != ":memory:":
+        return get_data_version(database) + (_sqlite_data_version(database),)
+    return get_data_version() + (_commit_count(engine),)
+
+
+def bump_data_version():
+    """Changes the data version so that everything cached by version is rebuilt on next use."""
+    global _version
+    with _lock:
+        _version += 1
+        return _version
+
+
+def _file_stats(f):
+    """Modification time and size of the file and of its SQLite -wal file, 0 for a file that does not exist."""
+    stats = []
+    for path in (Path(f), Path(f"{f}-wal")):
+        try:
+            stat = path.stat()
+            stats += [stat.st_mtime_ns, stat.st_size]
+        except OSError:
+            stats += [0, 0]
+    return stats
+
+
+def _sqlite_data_version(database):
+    with _lock:
+        watcher = _watchers.get(database)
+        # A connection must not be used by two processes, so a forked process opens its own
+        if watcher is None or watcher[0] != os.getpid():
+            if not Path(database).exists():
+                # Connecting would create the file, the version will change when it is created
+                return None
+            watcher = _watchers[database] = (os.getpid(), sqlite3.connect(database, check_same_thread=False))
+        return watcher[1].execute("PRAGMA data_version").fetchone()[0]
+
+
+def _commit_count(engine):
+    if engine not in _commits:
+        with _lock:
+            if engine not in _commits:
+                _commits[engine] = 0
+
+                def count_commit(connection):
+                    connection.info["committed"] = True
+                    _bump_commits(engine)
+
+                def count_checkin(dbapi_connection, connection_record):
+                    # The commit event is sent before the commit is made, so count it again once the connection is
+                    # returned to the pool, so that a version read during the commit is not kept for the new data
+                    if connection_record is not None and connection_record.info.pop("committed", False):
+                        _bump_commits(engine)
+
+                event.listen(engine, "commit", count_commit)
+                event.listen(engine.pool, "checkin", count_checkin)
+    return _commits[engine]
+
+
+def _bump_commits(engine):
+    with _lock:
+        _commits[engine] += 1
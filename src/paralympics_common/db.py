@@ -0,0 +1,69 @@
+"""Database connection settings shared by the apps that use Flask-SQLAlchemy.
+
+- pool_options(): the connection pool shared by the threads of a server
+- set_sqlite_pragmas(): runs PRAGMA statements, e.g. journal_mode=WAL, on each new SQLite connection
+- dispose_after_fork(): discards an app's connections in a forked worker process
+
+A server with several worker processes, e.g. gunicorn --preload, forks after the app has connected to the database.
+A connection must not be used by two processes, so the child discards its copies without closing them, as closing
+them would affect the parent's connections, and opens its own when it first needs one.
+"""
+import os
+import weakref
+
+from sqlalchemy import event
+
+# Engines of the apps passed to dispose_after_fork(), kept only while their app exists
+_engines = weakref.WeakSet()
+
+
+def pool_options():
+    """Returns the SQLALCHEMY_ENGINE_OPTIONS for a connection pool shared by the threads of the server."""
+    return {
+        # Number of connections kept open, and how many more can be opened when they are all in use
+        "pool_size": 5,
+        "max_overflow": 10,
+        # Seconds a thread waits for a connection from the pool before an error is raised
+        "pool_timeout": 30,
+        # Seconds SQLite waits for another connection to finish writing, rather than fail with "database is locked"
+        "connect_args": {"timeout": 15},
+    }
+
+
+def set_sqlite_pragmas(engine, pragmas):
+    """Runs the PRAGMA statements on each new connection of the engine, if it is a SQLite database.
+
+    Args:
+        engine: SQLAlchemy engine
+        pragmas: dictionary of pragma names and values, e.g. {"journal_mode": "WAL"}
+    """
+    if not pragmas or engine.dialect.name != "sqlite":
+        return
+
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    event.listen(engine, "connect", on_connect)
+
+
+def dispose_after_fork(db, app):
+    """Discards the connections of the app's engines in a forked process.
+
+    Args:
+        db: the Flask-SQLAlchemy extension, already initialised with the app
+        app: Flask app
+    """
+    with app.app_context():
+        _engines.update(db.engines.values())
+
+
+def _dispose_engines_after_fork():
+    for engine in list(_engines):
+        engine.dispose(close=False)
+
+
+# Registered once, however many apps are created
+os.register_at_fork(after_in_child=_dispose_engines_after_fork)
@@ -0,0 +1,165 @@
+"""Event details by id for the Dash apps, without the REST API.
+
+The events are read from the columnar copy of paralympic_events.csv once and kept in a dictionary keyed by event id,
+so looking up an event for a card does not read the file again. The ids are the same as those used by the REST API:
+its add_data() function numbers the rows of the CSV file from 1.
+
+Events that have been changed through the REST API are applied on top of the CSV file with apply_event_change(), see
+sync.py. The changes are kept until the process ends, so they are not lost when the CSV file is read again.
+
+Usage:
+    from paralympics_common.events import get_event
+    ev = get_event(12)
+"""
+import math
+import re
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+import pandas as pd
+
+from paralympics_common.columnar import read_data
+
+event_data = Path(__file__).parent.parent.parent.joinpath("data", "paralympic_events.csv")
+
+# Text that is a number, e.g. '23.0'
+_NUMBER = re.compile(r"-?\d+(\.\d+)?")
+
+_lock = threading.Lock()
+# Events changed through the REST API, event id: event dictionary, or None if the event was deleted
+_changes = {}
+
+
+def get_event(event_id):
+    """Returns the details of one event.
+
+    Args:
+        event_id: the id of the event, the same as the id of the event in the REST API
+
+    Returns:
+        ev: dictionary of the event details, missing values are None
+
+    Raises:
+        KeyError: if there is no event with the id
+    """
+    event_id = int(event_id)
+    if event_id in _changes:
+        ev = _changes[event_id]
+        if ev is None:
+            raise KeyError(event_id)
+        return dict(ev)
+    return dict(_events_by_id(_file_version())[event_id])
+
+
+def get_events(event_ids):
+    """Returns the details of several events.
+
+    Args:
+        event_ids: list of event ids
+
+    Returns:
+        events: list with a dictionary of the event details for each id, in the same order as the ids
+
+    Raises:
+        KeyError: if there is no event with one of the ids
+    """
+    return [get_event(event_id) for event_id in event_ids]
+
+
+def get_events_frame(columns=None):
+    """Returns the events as a pandas DataFrame, including the changes made through the REST API.
+
+    Args:
+        columns: list of the columns to read, or None for all columns
+
+    Returns:
+        df_events: pandas DataFrame in the same format as read_data("paralympic_events")
+    """
+    df_events = read_data("paralympic_events", columns=columns)
+    if not _changes:
+        return df_events
+    with _lock:
+        changes = dict(_changes)
+    # Use the event ids as the index while the changes are applied
+    df_events.index += 1
+    deleted = [event_id for event_id, ev in changes.items() if ev is None and event_id in df_events.index]
+    df_events = df_events.drop(index=deleted)
+    updated = {event_id: {column: ev.get(column) for column in df_events.columns}
+               for event_id, ev in changes.items() if ev is not None}
+    if updated:
+        df_updated = pd.DataFrame.from_dict(updated, orient="index", columns=df_events.columns)
+        # The REST API returns some numbers as text, e.g. countries, so use the types from the CSV file
+        for column in df_events.columns:
+            if pd.api.types.is_numeric_dtype(df_events[column]):
+                df_updated[column] = pd.to_numeric(df_updated[column], errors="coerce")
+        df_events = pd.concat([df_events.drop(index=df_updated.index, errors="ignore"), df_updated]).sort_index()
+    return df_events.reset_index(drop=True)
+
+
+def apply_event_change(event_id, ev):
+    """Applies an event that was added, updated or deleted through the REST API.
+
+    Args:
+        event_id: the id of the event
+        ev: dictionary of the event details from the REST API, or None if the event was deleted
+    """
+    if ev is not None:
+        ev = from_rest(ev)
+        ev["id"] = int(event_id)
+    with _lock:
+        _changes[int(event_id)] = ev
+
+
+def from_rest(ev):
+    """Returns an event from the REST API with the same types as get_event(), e.g. countries is '23.0' in the REST API
+    and 23 here.
+
+    Args:
+        ev: dictionary of the event details from the REST API
+
+    Returns:
+        ev: new dictionary of the event details
+    """
+    return {column: _to_python(_from_text(value)) for column, value in ev.items()}
+
+
+def clear_changes():
+    """Removes the changes applied with apply_event_change(), e.g. when the REST API database has been recreated."""
+    with _lock:
+        _changes.clear()
+
+
+def _file_version():
+    return event_data.stat().st_mtime_ns
+
+
+@lru_cache(maxsize=1)
+def _events_by_id(version):
+    """Reads the events from the columnar copy of the CSV file, only the events for the latest version are kept."""
+    df_events = read_data("paralympic_events")
+    # The REST API numbers the events from 1, see add_data() in paralympics_rest/utilities.py
+    df_events.index += 1
+    events_by_id = {}
+    for event_id, row in zip(df_events.index, df_events.to_dict(orient="records")):
+        ev = {"id": int(event_id)}
+        ev.update({column: _to_python(value) for column, value in row.items()})
+        events_by_id[int(event_id)] = ev
+    return events_by_id
+
+
+def _to_python(value):
+    """Converts NaN to None and whole number floats, e.g. counts in a column with missing values, to int."""
+    if isinstance(value, float):
+        if math.isnan(value):
+            return None
+        if value.is_integer():
+            return int(value)
+    return value
+
+
+def _from_text(value):
+    """Converts numbers that the REST API stores as text, e.g. countries is '23.0', to a float."""
+    if isinstance(value, str) and _NUMBER.fullmatch(value):
+        return float(value)
+    return value
@@ -0,0 +1,233 @@
+"""Read-only access to the event locations used by the map figures in the Dash apps.
+
+The map figures used to open a new sqlite3 connection on every call, never closed it, joined the event and location
+tables on the host city text and converted the lat/lon values from TEXT to float each time.
+
+This module opens one read-only connection per thread and database file, and caches the joined event locations in
+memory. After the first call a map figure needs no database work at all.
+
+A map with one marker per event is fine for the paralympic games, but not for tens of thousands of sub-events or
+venues. get_map_markers() groups nearby locations into one marker per grid cell once there are more than MAX_MARKERS
+locations. The clusters are precomputed for each zoom level, and each zoom level halves the size of the cells and of
+the area of the map that is shown, so every view of the map has about the same number of cells.
+
+The location table stores lat/lon as REAL and has an index on city. Databases created before this change can be
+upgraded by running this module:
+
+    python -m paralympics_common.geo
+"""
+import math
+import os
+import sqlite3
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+import pandas as pd
+
+# Maximum number of markers in one map figure, more locations than this are shown as clusters
+MAX_MARKERS = 500
+
+# Highest zoom level with precomputed clusters, above this the individual locations are shown
+MAX_ZOOM = 8
+
+# Size in degrees of the grid cells at zoom level 0. The map at zoom level z shows 180 / 2**z degrees of latitude by
+# 360 / 2**z degrees of longitude, so any view has at most 13 x 25 cells with markers, fewer than MAX_MARKERS
+CELL_DEGREES = 15
+
+# sqlite3 connections can only be used by the thread that created them, so each thread has its own
+_local = threading.local()
+
+
+def _after_fork():
+    """A connection must not be used in a forked process, e.g. a background callback job, so open new ones."""
+    global _local
+    _local = threading.local()
+
+
+os.register_at_fork(after_in_child=_after_fork)
+
+
+def get_connection(db_file):
+    """Returns a read-only connection to the database file for the current thread.
+
+    The connection is opened with mode=ro and immutable=1, so SQLite does no locking or change detection. The Dash
+    apps never write to their database file while they are running.
+
+    Args:
+        db_file: path to the SQLite database file
+
+    Returns:
+        connection: sqlite3 connection
+    """
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    db_path = Path(db_file).resolve()
+    connection = connections.get(db_path)
+    if connection is None:
+        connection = sqlite3.connect(f"{db_path.as_uri()}?mode=ro&immutable=1", uri=True)
+        connections[db_path] = connection
+    return connection
+
+
+def get_event_locations(db_file):
+    """Returns a DataFrame of the id, host, year, name, lat and lon of each event.
+
+    The DataFrame is read from the database on the first call and cached, so do not modify the returned DataFrame.
+
+    Args:
+        db_file: path to the SQLite database file
+
+    Returns:
+        df_locs: pandas DataFrame with one row per event
+    """
+    return _event_locations(Path(db_file).resolve())
+
+
+@lru_cache(maxsize=None)
+def _event_locations(db_path):
+    sql = '''
+        SELECT event.id, event.host, event.year, location.lat, location.lon
+        FROM event
+        JOIN location ON event.host = location.city
+        '''
+    df_locs = pd.read_sql(sql=sql, con=get_connection(db_path), index_col=None)
+    # The values are already REAL in an upgraded database, this only converts those in a database that is not
+    df_locs['lon'] = df_locs['lon'].astype(float)
+    df_locs['lat'] = df_locs['lat'].astype(float)
+    df_locs['name'] = df_locs['host'] + ' ' + df_locs['year'].astype(str)
+    return df_locs
+
+
+def get_map_markers(db_file, zoom=0, center=None):
+    """Returns a DataFrame with the markers to show on the map at a zoom level.
+
+    If there are no more than MAX_MARKERS locations each event has its own marker. Otherwise, the locations are grouped
+    into clusters for the zoom level. Only clusters inside the visible area are returned when the center of the map is
+    given, and a lower zoom level is used until there are no more than MAX_MARKERS markers.
+
+    Args:
+        db_file: path to the SQLite database file
+        zoom: zoom level of the map, 0 shows the whole world
+        center: (lat, lon) of the center of the map, or None for the whole world
+
+    Returns:
+        df_markers: pandas DataFrame with the columns id, name, lat, lon and count. The id is the event id for a marker
+        with a single event and None for a cluster.
+    """
+    db_path = Path(db_file).resolve()
+    df_locs = _event_locations(db_path)
+    if len(df_locs) <= MAX_MARKERS:
+        return _leaf_markers(db_path)
+
+    zoom = max(0, int(zoom))
+    while True:
+        df_markers = _leaf_markers(db_path) if zoom > MAX_ZOOM else _clusters(db_path)[zoom]
+        if center is not None:
+            df_markers = _visible(df_markers, zoom, center)
+        if len(df_markers) <= MAX_MARKERS or zoom == 0:
+            return df_markers
+        zoom -= 1
+
+
+def map_zoom(scale):
+    """Converts the geo.projection.scale of a Plotly scatter_geo map to a zoom level.
+
+    Args:
+        scale: projection scale, 1 shows the whole world and each doubling of the scale is one zoom level
+
+    Returns:
+        zoom: int zoom level
+    """
+    return max(0, int(math.floor(math.log2(max(float(scale), 1)))))
+
+
+def is_clustered(db_file):
+    """Returns True if there are too many locations to show one marker per event."""
+    return len(get_event_locations(db_file)) > MAX_MARKERS
+
+
+@lru_cache(maxsize=None)
+def _leaf_markers(db_path):
+    df_locs = _event_locations(db_path)
+    df_markers = df_locs[['id', 'name', 'lat', 'lon']].astype({'id': object})
+    df_markers['count'] = 1
+    return df_markers
+
+
+@lru_cache(maxsize=None)
+def _clusters(db_path):
+    """Groups the locations into grid cells for every zoom level from 0 to MAX_ZOOM."""
+    df_locs = _event_locations(db_path)
+    clusters = {}
+    for zoom in range(MAX_ZOOM + 1):
+        cell = CELL_DEGREES / 2 ** zoom
+        cells = df_locs.assign(row=(df_locs['lat'] // cell), col=(df_locs['lon'] // cell))
+        df_cells = cells.groupby(['row', 'col']).agg(lat=('lat', 'mean'),
+                                                     lon=('lon', 'mean'),
+                                                     count=('id', 'size'),
+                                                     id=('id', 'first'),
+                                                     name=('name', 'first')).reset_index(drop=True)
+        # A cell with one event is shown as the event, so hovering over it still displays the event card
+        is_cluster = df_cells['count'] > 1
+        df_cells['id'] = df_cells['id'].astype(object).where(~is_cluster, None)
+        df_cells.loc[is_cluster, 'name'] = df_cells.loc[is_cluster, 'count'].astype(str) + ' events'
+        clusters[zoom] = df_cells[['id', 'name', 'lat', 'lon', 'count']]
+    return clusters
+
+
+def _visible(df_markers, zoom, center):
+    """Returns the markers that are inside the area of the map shown at the zoom level around center."""
+    lat, lon = center
+    half_lat = 90 / 2 ** zoom
+    half_lon = 180 / 2 ** zoom
+    # Longitude wraps around at +/-180 degrees
+    lon_distance = ((df_markers['lon'] - lon + 180) % 360 - 180).abs()
+    return df_markers[((df_markers['lat'] - lat).abs() <= half_lat) & (lon_distance <= half_lon)]
+
+
+def clear_cache():
+    """Remove the cached event locations and markers so that the next call reads them from the database again."""
+    _event_locations.cache_clear()
+    _leaf_markers.cache_clear()
+    _clusters.cache_clear()
+
+
+def upgrade_location_table(db_file):
+    """Changes the lat and lon columns of the location table to REAL and adds an index on city.
+
+    Does nothing to a database that has already been upgraded.
+
+    Args:
+        db_file: path to the SQLite database file
+    """
+    connection = sqlite3.connect(db_file)
+    try:
+        column_types = {row[1]: row[2] for row in connection.execute("PRAGMA table_info(location)")}
+        if column_types.get("lat") != "REAL" or column_types.get("lon") != "REAL":
+            # SQLite cannot change the type of a column, so copy the data to a new table and replace the old one
+            connection.executescript("""
+                BEGIN;
+                CREATE TABLE location_new(
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    city TEXT NOT NULL,
+                    lat REAL NOT NULL,
+                    lon REAL NOT NULL);
+                INSERT INTO location_new(id, city, lat, lon)
+                    SELECT id, city, CAST(lat AS REAL), CAST(lon AS REAL) FROM location;
+                DROP TABLE location;
+                ALTER TABLE location_new RENAME TO location;
+                COMMIT;
+                """)
+        connection.execute("CREATE INDEX IF NOT EXISTS ix_location_city ON location(city)")
+        connection.commit()
+    finally:
+        connection.close()
+
+
+if __name__ == '__main__':
+    src = Path(__file__).parent.parent
+    for app_db in [src.joinpath("paralympics_dash", "paralympics.sqlite"),
+                   src.joinpath("paralympics_dash_multi", "paralympics.sqlite")]:
+        upgrade_location_table(app_db)
@@ -0,0 +1,159 @@
+"""Medals data from data/medals.xlsx.
+
+Reading an xlsx workbook with openpyxl takes far too long to do for a request, so the workbook is only read when it
+changes:
+
+- read_medals() returns the medals from a columnar copy of the workbook (see columnar.py).
+- ingest_medals() writes the medals to a 'medal' table in an SQLite database, with indexes on NOC and type. The Dash
+  apps and the REST API then query the table.
+
+The workbook has a Summer and a Winter sheet with one row per team, which are normalised to one row per team and type
+of games. The Total sheet is not stored as it is the sum of the other two. The workbook has no year, so the
+medal table is indexed on the type of games instead.
+
+Some cells in the workbook are damaged: many team names end with a non-breaking space, and China's code is ')[a'. The
+names and codes are stripped, and a code that is not three capital letters is replaced by the code of the team's name
+in data/noc_regions.csv.
+
+To add the medal table to the Dash app databases run:
+
+    python -m paralympics_common.medals
+"""
+import re
+import sqlite3
+from functools import lru_cache
+from pathlib import Path
+
+import pandas as pd
+
+from paralympics_common.columnar import DATA_DIR, READ_CSV_OPTIONS, read_columnar
+from paralympics_common.geo import get_connection
+
+MEDALS_FILE = DATA_DIR.joinpath("medals.xlsx")
+
+# Version of _read_workbook(), change it when the function changes so the columnar copy is created again
+READER_VERSION = 3
+
+# Workbook sheet names and the value of the 'type' column for the medals in each sheet
+SHEETS = {"Summer": "summer", "Winter": "winter"}
+
+# Workbook column names and the medal table column names
+COLUMNS = {"Team": "team", "Code": "NOC", "Number": "games", "Gold": "gold", "Silver": "silver", "Bronze": "bronze",
+           "Total": "total"}
+
+# A valid NOC code, e.g. CHN
+_NOC_CODE = re.compile(r"[A-Z]{3}")
+
+
+def read_medals(columns=None):
+    """Returns the medals for each team and type of games as a pandas DataFrame.
+
+    Args:
+        columns: list of the columns to read, or None for all columns
+
+    Returns:
+        df_medals: pandas DataFrame with the columns NOC, team, type, games, gold, silver, bronze and total
+    """
+    return read_columnar("medals", MEDALS_FILE, _read_workbook, columns, version=READER_VERSION)
+
+
+def ingest_medals(db_file):
+    """Creates the medal table in an SQLite database and replaces its contents with the medals from the workbook.
+
+    Args:
+        db_file: path to the SQLite database file
+    """
+    df_medals = read_medals()
+    connection = sqlite3.connect(db_file)
+    try:
+        with connection:
+            connection.execute("""CREATE TABLE if not exists medal(
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        NOC TEXT NOT NULL,
+                        team TEXT NOT NULL,
+                        type TEXT NOT NULL,
+                        games INTEGER,
+                        gold INTEGER,
+                        silver INTEGER,
+                        bronze INTEGER,
+                        total INTEGER);
+                        """)
+            connection.execute("CREATE INDEX if not exists ix_medal_NOC ON medal(NOC);")
+            connection.execute("CREATE INDEX if not exists ix_medal_type ON medal(type);")
+            connection.execute("DELETE FROM medal;")
+            df_medals.to_sql("medal", connection, if_exists="append", index=False)
+    finally:
+        connection.close()
+
+
+def get_medal_table(db_file, event_type=None):
+    """Returns the medals won by each team, ordered by gold, silver then bronze medals.
+
+    The result is read from the medal table in the database once and then cached, so do not modify it.
+
+    Args:
+        db_file: path to the SQLite database file
+        event_type: summer or winter for the medals at one type of games, None for the total of both
+
+    Returns:
+        df_medals: pandas DataFrame with the columns NOC, team, games, gold, silver, bronze and total
+    """
+    return _medal_table(Path(db_file).resolve(), event_type)
+
+
+@lru_cache(maxsize=None)
+def _medal_table(db_path, event_type):
+    sql = '''
+        SELECT NOC, team, SUM(games) AS games, SUM(gold) AS gold, SUM(silver) AS silver, SUM(bronze) AS bronze,
+            SUM(total) AS total
+        FROM medal
+        WHERE (:type IS NULL OR type = :type)
+        GROUP BY NOC, team
+        ORDER BY gold DESC, silver DESC, bronze DESC
+        '''
+    return pd.read_sql(sql=sql, con=get_connection(db_path), params={"type": event_type})
+
+
+def clear_cache():
+    """Remove the cached medal tables so that the next call reads them from the database again."""
+    _medal_table.cache_clear()
+
+
+def _read_workbook():
+    """Reads the Summer and Winter sheets from the workbook into one DataFrame with a row per team and type."""
+    # 'NA' is the NOC code for Namibia so only empty values are missing
+    sheets = pd.read_excel(MEDALS_FILE, sheet_name=list(SHEETS), keep_default_na=False, na_values=[""])
+    frames = []
+    for sheet, event_type in SHEETS.items():
+        frames.append(sheets[sheet].rename(columns=COLUMNS).assign(type=event_type))
+    df_medals = pd.concat(frames, ignore_index=True)
+    # The last row of each sheet is the total of all teams, which has no team or code
+    df_medals = df_medals.dropna(subset=["NOC"])
+    # str.strip() also removes the non-breaking spaces at the end of the team names
+    df_medals["team"] = df_medals["team"].str.strip()
+    df_medals["NOC"] = df_medals["NOC"].str.strip()
+    damaged = ~df_medals["NOC"].map(lambda code: bool(_NOC_CODE.fullmatch(code)))
+    codes = df_medals.loc[damaged, "team"].map(_noc_codes_by_name())
+    # Keep the code from the workbook if the team's name is not found, rather than lose the team's medals
+    df_medals.loc[damaged, "NOC"] = codes.fillna(df_medals.loc[damaged, "NOC"])
+    return df_medals[["NOC", "team", "type", "games", "gold", "silver", "bronze", "total"]]
+
+
+def _noc_codes_by_name():
+    """Returns a Series of NOC codes indexed by team name, from data/noc_regions.csv.
+
+    The name is the notes if there are any, e.g. Hong Kong, otherwise the region, e.g. China. Names that have more than
+    one code, e.g. Germany, are left out as the team cannot be known from its name.
+    """
+    # Read the file itself, read_data() cannot be used while the columnar copy of the workbook is being created
+    df_regions = pd.read_csv(DATA_DIR.joinpath("noc_regions.csv"), **READ_CSV_OPTIONS["noc_regions"])
+    names = df_regions["notes"].fillna(df_regions["region"]).str.strip()
+    codes = pd.Series(df_regions["NOC"].values, index=names)
+    return codes[~codes.index.duplicated(keep=False)]
+
+
+if __name__ == '__main__':
+    src = Path(__file__).parent.parent
+    for app_db in [src.joinpath("paralympics_dash", "paralympics.sqlite"),
+                   src.joinpath("paralympics_dash_multi", "paralympics.sqlite")]:
+        ingest_medals(app_db)
@@ -0,0 +1,204 @@
+"""Client for the paralympics REST API that is shared by the Dash apps.
+
+The Dash apps used to call `requests.get()` for every hover event on the map. That opened a new connection each time,
+had no timeout and no retries, so a slow REST API blocked every callback that displays an event card.
+
+This module keeps a single pooled `requests.Session` (HTTP keep-alive), applies a timeout and retries with backoff to
+every request, and caches each event for a short time. When a cached event expires its ETag is sent back to the API so
+that an unchanged event costs a 304 response rather than the full JSON.
+
+When the Dash apps are mounted on the same Flask server as the REST API (see paralympics_server), use_local() makes the
+client call the REST API's data layer directly, without the HTTP request and the JSON encoding and decoding.
+
+The REST API stores some numbers as text, e.g. countries is '23.0', so the events are converted with
+events.from_rest() to have the same values as the events read from the CSV file.
+
+Usage:
+    from paralympics_common.rest_client import rest_client
+    ev = rest_client.get_event(12)
+"""
+import logging
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from paralympics_common.events import from_rest
+
+logger = logging.getLogger(__name__)
+
+# Check your port number if you changed it from the default 5000
+REST_API_URL = "http://127.0.0.1:5000"
+
+
+class EventClient:
+    """Pooled and cached client for the /events routes of the REST API.
+
+    Args:
+        base_url: URL of the REST API, e.g. http://127.0.0.1:5000
+        timeout: (connect, read) timeout in seconds applied to every request
+        retries: number of times a failed connection or a 502/503/504 response is retried
+        backoff: backoff factor in seconds between retries, doubled on each retry
+        ttl: number of seconds a cached event is used before it is checked with the REST API again
+        pool_size: maximum number of keep-alive connections kept open to the REST API
+    """
+
+    def __init__(self, base_url=REST_API_URL, timeout=(2, 5), retries=2, backoff=0.2, ttl=60, pool_size=10):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.ttl = ttl
+        self._retry = Retry(total=retries,
+                            backoff_factor=backoff,
+                            status_forcelist=[502, 503, 504],
+                            allowed_methods=["GET"])
+        self._pool_size = pool_size
+        self._session = None
+        # Cache of event_id: (etag, event dict, time the entry expires)
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._prefetch_thread = None
+        # Functions that return the events in the same process, set by use_local()
+        self._local_event = None
+        self._local_events = None
+
+    def use_local(self, get_event, get_events):
+        """Get the events by calling functions in the same process rather than from the REST API over HTTP.
+
+        The events are not cached, as the functions read them from the database without a network request.
+
+        Args:
+            get_event: function that takes an event id and returns the event as a dictionary, or raises KeyError
+            get_events: function with no arguments that returns all events as a list of dictionaries
+        """
+        self._local_event = get_event
+        self._local_events = get_events
+
+    @property
+    def is_local(self):
+        """True if use_local() has been called, so getting an event does not make a request over the network."""
+        return self._local_event is not None
+
+    @property
+    def session(self):
+        """The shared requests Session, created on first use so that importing the module opens no connections."""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self._pool_size, max_retries=self._retry)
+                    session = requests.Session()
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    self._session = session
+        return self._session
+
+    def get_event(self, event_id):
+        """Returns the details of one event as a dictionary.
+
+        A cached event is returned without a request until it is older than the ttl. After that the request includes
+        the cached ETag, and a 304 Not Modified response renews the cached entry. If the REST API cannot be reached the
+        stale cached event is returned rather than failing.
+
+        Args:
+            event_id: the id of the event
+
+        Returns:
+            ev: dictionary of the event details
+
+        Raises:
+            requests.RequestException: if the REST API fails and the event has never been cached
+            KeyError: if use_local() has been called and there is no event with the id
+        """
+        event_id = int(event_id)
+        if self._local_event is not None:
+            return from_rest(self._local_event(event_id))
+        with self._lock:
+            cached = self._cache.get(event_id)
+        if cached is not None and cached[2] > time.monotonic():
+            return cached[1]
+
+        headers = {}
+        if cached is not None and cached[0]:
+            headers["If-None-Match"] = cached[0]
+        try:
+            response = self.session.get(f"{self.base_url}/events/{event_id}", headers=headers, timeout=self.timeout)
+            if response.status_code == 304 and cached is not None:
+                ev = cached[1]
+                etag = cached[0]
+            else:
+                response.raise_for_status()
+                ev = from_rest(response.json())
+                etag = response.headers.get("ETag")
+        except requests.RequestException as e:
+            if cached is None:
+                raise
+            logger.warning(f"REST API request for event {event_id} failed, using the cached event. Error: {e}")
+            return cached[1]
+
+        self._store(event_id, ev, etag)
+        return ev
+
+    def get_events(self):
+        """Returns all events from the REST API as a list of dictionaries and adds each one to the cache."""
+        if self._local_events is not None:
+            return [from_rest(ev) for ev in self._local_events()]
+        response = self.session.get(f"{self.base_url}/events", timeout=self.timeout)
+        response.raise_for_status()
+        events = [from_rest(ev) for ev in response.json()]
+        for ev in events:
+            self._store(ev["id"], ev, None)
+        return events
+
+    def prefetch(self, background=True):
+        """Load all the events into the cache so that hovering over a map marker does not wait for the network.
+
+        Args:
+            background: if True the events are fetched in a daemon thread and the function returns immediately
+
+        Returns:
+            the prefetch thread if background is True, otherwise None
+        """
+        if not background:
+            self._prefetch()
+            return None
+        with self._lock:
+            if self._prefetch_thread is None or not self._prefetch_thread.is_alive():
+                self._prefetch_thread = threading.Thread(target=self._prefetch, name="event-prefetch", daemon=True)
+                self._prefetch_thread.start()
+            return self._prefetch_thread
+
+    def set_event(self, event_id, ev):
+        """Replace the cached details of one event, e.g. with an event from the change feed, see sync.py."""
+        self._store(event_id, from_rest(ev), None)
+
+    def clear(self, event_id=None):
+        """Remove one event, or all events if event_id is None, from the cache."""
+        with self._lock:
+            if event_id is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(int(event_id), None)
+
+    def _after_fork(self):
+        """Open new connections in a forked process, e.g. a background callback job, rather than share the parent's."""
+        self._lock = threading.Lock()
+        self._session = None
+        self._prefetch_thread = None
+
+    def _prefetch(self):
+        try:
+            self.get_events()
+        except requests.RequestException as e:
+            # The REST API is optional for the Dash apps, so only log that it could not be reached
+            logger.warning(f"Could not prefetch events from the REST API at {self.base_url}. Error: {e}")
+
+    def _store(self, event_id, ev, etag):
+        with self._lock:
+            self._cache[int(event_id)] = (etag, ev, time.monotonic() + self.ttl)
+
+
+# Client shared by all callbacks in a process
+rest_client = EventClient()
+os.register_at_fork(after_in_child=rest_client._after_fork)
@@ -0,0 +1,229 @@
+"""Incremental refresh of the Dash app data from the change feed of the REST API.
+
+The REST API records every change to an event or region made through its routes in a change feed, numbered by a
+version that only ever increases. A ChangeFeedClient reads GET /changes?since=<version> and applies the changed events
+to the in-memory event data (see events.py) and the event cache of the REST client. Only the records that changed are
+downloaded, not the whole table.
+
+Rather than poll, the client subscribes to the server-sent events of GET /stream, which sends a notification when a
+write route commits a change, and only reads /changes when it is notified. One connection per Dash process is kept
+open, however many browsers use the dashboard. If the REST API has no /stream route the client polls /changes every
+few seconds instead.
+
+A notification only reaches the clients of the REST API process that made the change, see broadcast.py. When the REST
+API runs in several processes the client also reads /changes each time the stream sends a keep-alive, so a change made
+in another process is applied within one keep-alive interval, 15 seconds by default.
+
+The data version is only bumped when a change has been applied, so page layouts and figures that are cached by data
+version are built again the next time they are used, and are not rebuilt while nothing changes.
+
+When the Dash apps are mounted on the same Flask server as the REST API (see paralympics_server), use_local() makes the
+client read the changes and the notifications in the same process rather than over HTTP.
+
+Usage:
+    from paralympics_common.sync import change_feed
+    change_feed.start()
+"""
+import json
+import logging
+import os
+import queue
+import threading
+
+import requests
+
+from paralympics_common import events
+from paralympics_common.data_version import bump_data_version
+from paralympics_common.rest_client import rest_client
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeFeedClient:
+    """Polls the change feed of the REST API and applies the changes.
+
+    Args:
+        client: EventClient whose session and event cache are used
+        interval: number of seconds between polls, or before reconnecting to the stream
+        max_interval: longest number of seconds between polls while the REST API cannot be reached
+        stream: if True, wait for notifications from /stream rather than poll /changes
+        stream_timeout: seconds without any message, including keep-alives, after which the stream is reconnected
+        local_check_interval: seconds between polls while waiting for a notification in the same process, see
+            use_local(), as the keep-alives of /stream do over HTTP
+    """
+
+    def __init__(self, client=rest_client, interval=2, max_interval=60, stream=True, stream_timeout=45,
+                 local_check_interval=15):
+        self.client = client
+        self.interval = interval
+        self.max_interval = max_interval
+        self.stream = stream
+        self.stream_timeout = stream_timeout
+        self.local_check_interval = local_check_interval
+        # Version of the last change that has been applied, 0 to start with every change
+        self.version = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        # Function and broadcaster that provide the changes in the same process, set by use_local()
+        self._local_changes = None
+        self._local_broadcaster = None
+
+    def use_local(self, get_changes, broadcaster):
+        """Read the changes and notifications in the same process rather than from the REST API over HTTP.
+
+        Args:
+            get_changes: function that takes the since version and returns the same dictionary as GET /changes
+            broadcaster: the REST API Broadcaster, its subscribe() and unsubscribe() methods are used
+        """
+        self._local_changes = get_changes
+        self._local_broadcaster = broadcaster
+
+    def poll(self):
+        """Requests the changes since the last poll and applies them.
+
+        Returns:
+            changed: number of events and regions that changed
+
+        Raises:
+            requests.RequestException: if the REST API cannot be reached
+        """
+        with self._lock:
+            feed = self._fetch(self.version)
+            if feed["version"] < self.version:
+                # The REST API database was recreated, so the changes applied so far may no longer be true
+                logger.warning("The REST API change feed has restarted, applying all of its changes again")
+                events.clear_changes()
+                self.client.clear()
+                bump_data_version()
+                feed = self._fetch(0)
+            return self._apply(feed)
+
+    def start(self):
+        """Follows the change feed in a daemon thread until stop() is called.
+
+        Returns:
+            the polling thread
+        """
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="change-feed", daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def stop(self):
+        """Stops the thread after its current poll, or after the next message on the stream."""
+        self._stop.set()
+
+    def listen(self):
+        """Applies the changes each time the REST API sends a notification or a keep-alive, returns when the stream is
+        closed.
+
+        Raises:
+            requests.RequestException: if the REST API cannot be reached or the stream times out
+        """
+        if self._local_broadcaster is not None:
+            self._listen_local()
+            return
+        url = f"{self.client.base_url}/stream"
+        timeout = (self.client.timeout[0], self.stream_timeout)
+        with self.client.session.get(url, stream=True, timeout=timeout) as response:
+            response.raise_for_status()
+            for data in _read_events(response.iter_lines(decode_unicode=True)):
+                if self._stop.is_set():
+                    return
+                # A keep-alive is None, poll in case another REST API process has made a change it did not notify.
+                # A version lower than the one applied means that the change feed has restarted.
+                if data is None or data["version"] != self.version:
+                    self.poll()
+
+    def _listen_local(self):
+        subscriber = self._local_broadcaster.subscribe()
+        try:
+            # Apply any changes made before subscribing
+            self.poll()
+            while not self._stop.is_set():
+                try:
+                    message = subscriber.get(timeout=self.local_check_interval)
+                except queue.Empty:
+                    # Poll in case another server process has made a change
+                    self.poll()
+                    continue
+                if message["version"] != self.version:
+                    self.poll()
+        finally:
+            self._local_broadcaster.unsubscribe(subscriber)
+
+    def _run(self):
+        wait = self.interval
+        while not self._stop.is_set():
+            try:
+                if self.stream:
+                    self.listen()
+                else:
+                    self.poll()
+                wait = self.interval
+            except requests.HTTPError as e:
+                if self.stream and e.response is not None and e.response.status_code == 404:
+                    logger.info("The REST API has no /stream route, polling /changes instead")
+                    self.stream = False
+                else:
+                    wait = self._backoff(wait, e)
+            except requests.RequestException as e:
+                wait = self._backoff(wait, e)
+            self._stop.wait(wait)
+
+    def _backoff(self, wait, error):
+        # The REST API is optional for the Dash apps, so wait longer each time it cannot be reached
+        logger.debug(f"Could not read the REST API change feed. Error: {error}")
+        return min(wait * 2, self.max_interval)
+
+    def _fetch(self, since):
+        if self._local_changes is not None:
+            return self._local_changes(since)
+        response = self.client.session.get(f"{self.client.base_url}/changes", params={"since": since},
+                                           timeout=self.client.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def _apply(self, feed):
+        changes = feed["changes"]
+        for change in changes:
+            if change["entity"] != "event":
+                # The Dash apps do not show region details, but the data version is still bumped below
+                continue
+            event_id = int(change["key"])
+            if change["op"] == "delete":
+                events.apply_event_change(event_id, None)
+                self.client.clear(event_id)
+            else:
+                events.apply_event_change(event_id, change["data"])
+                self.client.set_event(event_id, change["data"])
+        self.version = feed["version"]
+        if changes:
+            bump_data_version()
+            logger.info(f"Applied {len(changes)} changes from the REST API, now at version {self.version}")
+        return len(changes)
+
+    def _after_fork(self):
+        """The polling thread is not copied into a forked process, e.g. a background callback job."""
+        self._lock = threading.Lock()
+        self._thread = None
+
+
+def _read_events(lines):
+    """Yields the JSON data of each server-sent event, and None for each keep-alive comment."""
+    data = []
+    for line in lines:
+        if line.startswith("data:"):
+            data.append(line[5:].strip())
+        elif line.startswith(":"):
+            yield None
+        elif not line and data:
+            yield json.loads("\n".join(data))
+            data = []
+
+
+# Change feed client shared by the callbacks in a process
+change_feed = ChangeFeedClient()
+os.register_at_fork(after_in_child=change_feed._after_fork)
@@ -0,0 +1,47 @@
+/*
+Clientside callback functions for the map. Dash loads .js files in the assets folder automatically.
+See https://dash.plotly.com/clientside-callbacks
+
+Moving the mouse across the map changes hoverData many times a second. Only the event id of the marker the mouse
+rests on is passed to the server, so the number of card requests depends on the events viewed, not mouse movement.
+A hover that is replaced during the delay is dropped here in the browser. Once the event id has been sent, the card is
+built in a background job that the next event id cancels on the server, see display_card in paralympics_dash.py.
+*/
+
+// Milliseconds the mouse must rest on a marker before the card is requested
+const HOVER_DELAY_MS = 250;
+
+// Incremented on every hover so that a delayed hover can tell it has been replaced by a newer one
+let latestHover = 0;
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    hover: {
+        /**
+         * Returns the event id of the hovered marker once the mouse has rested on it for HOVER_DELAY_MS.
+         *
+         * Returns no_update if the marker has no event id, if the id has not changed or if another hover happened
+         * during the delay.
+         *
+         * @param hoverData hoverData of the map graph
+         * @param currentId the event id currently displayed in the card
+         * @returns {Promise} resolves to the event id or dash_clientside.no_update
+         */
+        event_id: function (hoverData, currentId) {
+            const noUpdate = window.dash_clientside.no_update;
+            const request = ++latestHover;
+            if (!hoverData || !hoverData.points || hoverData.points.length === 0) {
+                return noUpdate;
+            }
+            const customdata = hoverData.points[0].customdata;
+            const eventId = Array.isArray(customdata) ? customdata[0] : customdata;
+            if (eventId === null || eventId === undefined || eventId === currentId) {
+                return noUpdate;
+            }
+            return new Promise(function (resolve) {
+                setTimeout(function () {
+                    resolve(request === latestHover ? eventId : noUpdate);
+                }, HOVER_DELAY_MS);
+            });
+        }
+    }
+});
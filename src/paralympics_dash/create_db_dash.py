@@ -6,6 +6,8 @@ from pathlib import Path
 import sqlite3
 import pandas as pd
 
+from paralympics_common.medals import ingest_medals
+
 
 def create_db():
     """Create SQLite database with data.
@@ -54,14 +56,18 @@ def create_db():
     create_location_table = """CREATE TABLE if not exists location(
                         id INTEGER PRIMARY KEY AUTOINCREMENT,
                         city TEXT NOT NULL,
-                        lat TEXT NOT NULL,
-                        lon TEXT NOT NULL);
+                        lat REAL NOT NULL,
+                        lon REAL NOT NULL);
                         """
 
+    # Index on city as the map figures join event.host to location.city
+    create_location_index = "CREATE INDEX if not exists ix_location_city ON location(city);"
+
     # 4. Execute SQL to create the tables in the database
     cursor.execute(create_region_table)
     cursor.execute(create_event_table)
     cursor.execute(create_location_table)
+    cursor.execute(create_location_index)
 
     # 5. Commit the changes to the database (this saves the tables created in the previous step)
     connection.commit()
@@ -93,6 +99,9 @@ def create_db():
     # 8. Close the database connection
     connection.close()
 
+    # 9. Add the medal table, with its indexes, from the medals workbook (see paralympics_common/medals.py)
+    ingest_medals(db_file)
+
 
 if __name__ == '__main__':
     create_db()
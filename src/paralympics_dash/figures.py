@@ -1,9 +1,11 @@
-import sqlite3
 from pathlib import Path
 
-import pandas as pd
 import plotly.express as px
 
+from paralympics_common.events import get_events_frame
+from paralympics_common.geo import get_event_locations, get_map_markers
+from paralympics_common.medals import get_medal_table
+
 event_data = Path(__file__).parent.parent.parent.joinpath("data", "paralympic_events.csv")
 paralympic_db = Path(__file__).parent.joinpath("paralympics.sqlite")
 
@@ -29,9 +31,9 @@ def line_chart(feature):
         # Make sure it is lowercase to match the dataframe column names
         feature = feature.lower()
 
-    # Read the data from pandas into a dataframe
+    # Read only the columns needed from the columnar copy of the CSV file into a dataframe
     cols = ["type", "year", "host", "events", "sports", "participants", "countries"]
-    line_chart_data = pd.read_csv(event_data, usecols=cols)
+    line_chart_data = get_events_frame(columns=cols)
 
     # Set the title for the chart using the value of 'feature'
     title_text = f"How has the number of {feature} changed over time?"
@@ -66,7 +68,7 @@ def bar_gender(event_type):
     :return: Plotly Express bar chart
     """
     cols = ['type', 'year', 'host', 'participants_m', 'participants_f', 'participants']
-    df_events = pd.read_csv(event_data, usecols=cols)
+    df_events = get_events_frame(columns=cols)
     # Drop Rome as there is no male/female data
     df_events.drop([0], inplace=True, )
     df_events.reset_index(drop=True)
@@ -100,7 +102,7 @@ def bar_gender_faceted(event_type):
     :return: Plotly Express bar chart
     """
     cols = ['type', 'year', 'host', 'participants_m', 'participants_f', 'participants']
-    df_events = pd.read_csv(event_data, usecols=cols)
+    df_events = get_events_frame(columns=cols)
 
     # Keep only rows where there is m/f data
     df_events = df_events[(df_events['participants_f'] >= 1)].reset_index(drop=True)
@@ -131,6 +133,28 @@ def bar_gender_faceted(event_type):
     return fig
 
 
+def bar_medals(event_type=None, top=10):
+    """
+    Creates a stacked bar chart of the gold, silver and bronze medals won by the teams with the most gold medals.
+
+    The medals are read from the medal table in the database, see paralympics_common/medals.py.
+
+    :param event_type: str summer or winter, or None for the total of both
+    :param top: int number of teams to show
+    :return: Plotly Express bar chart
+    """
+    df_medals = get_medal_table(paralympic_db, event_type).head(top)
+    fig = px.bar(df_medals,
+                 x='team',
+                 y=['gold', 'silver', 'bronze'],
+                 title='Which teams have won the most medals?',
+                 labels={'team': '', 'value': '', 'variable': ''},
+                 color_discrete_map={'gold': 'gold', 'silver': 'silver', 'bronze': 'peru'},
+                 template="simple_white"
+                 )
+    return fig
+
+
 def scatter_mapbox():
     """
     Create a Scatter mapbox showing the locations of the paralympic events.
@@ -139,19 +163,8 @@ def scatter_mapbox():
     see https://plotly.com/python/scattermapbox/
 
     """
-    # create database connection
-    connection = sqlite3.connect(paralympic_db)
-
-    # define the sql query
-    sql = '''
-    SELECT event.id, event.host, event.year, location.lat, location.lon
-    FROM event
-    JOIN location ON event.host = location.city 
-    '''
-
-    df_locs = pd.read_sql(sql=sql, con=connection, index_col=None)
-    df_locs['lon'] = df_locs['lon'].astype(float)
-    df_locs['lat'] = df_locs['lat'].astype(float)
+    # Event locations are read once from the database and then cached
+    df_locs = get_event_locations(paralympic_db)
 
     px.set_mapbox_access_token(open(".mapbox_token").read())
 
@@ -168,27 +181,28 @@ def scatter_mapbox():
     return fig
 
 
-def scatter_geo():
-    # create database connection
-    connection = sqlite3.connect(paralympic_db)
-
-    # define the sql query
-    sql = '''
-        SELECT event.id, event.host, event.year, location.lat, location.lon
-        FROM event
-        JOIN location ON event.host = location.city 
-        '''
+def scatter_geo(zoom=0, center=None):
+    """
+    Create a Scatter geo map showing the locations of the paralympic events.
 
-    df_locs = pd.read_sql(sql=sql, con=connection, index_col=None)
-    df_locs['lon'] = df_locs['lon'].astype(float)
-    df_locs['lat'] = df_locs['lat'].astype(float)
-    df_locs['name'] = df_locs['host'] + ' ' + df_locs['year'].astype(str)
+    If there are too many locations to show one marker per event, nearby events are grouped into a cluster marker
+    sized by the number of events. Hovering over a single event marker still gives the event id in customdata.
 
-    fig = px.scatter_geo(df_locs,
-                         lat=df_locs.lat,
-                         lon=df_locs.lon,
-                         hover_name=df_locs.name,
+    :param zoom: int zoom level of the map, 0 shows the whole world
+    :param center: (lat, lon) of the center of the map or None for the whole world
+    :return: Plotly Express scatter_geo figure
+    """
+    # Event locations are read once from the database and cached, as are the clusters for each zoom level
+    df_markers = get_map_markers(paralympic_db, zoom=zoom, center=center)
+
+    fig = px.scatter_geo(df_markers,
+                         lat=df_markers.lat,
+                         lon=df_markers.lon,
+                         hover_name=df_markers.name,
+                         size='count' if df_markers['count'].max() > 1 else None,
                          title="Where have the paralympics been held?",
                          custom_data='id' # required to be able to find the event from the marker
                          )
+    # Keep the user's zoom and position when the figure is replaced with the markers for a new zoom level
+    fig.update_layout(uirevision='map')
     return fig
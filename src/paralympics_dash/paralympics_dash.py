@@ -1,16 +1,23 @@
 """ Code as at the end of week 7 activities """
-import pandas as pd
-import requests
-from dash import Dash, html, dcc, Input, Output
+from dash import Dash, html, dcc, Input, Output, State, ClientsideFunction
+from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
 
-from figures import line_chart, bar_gender_faceted, scatter_geo, event_data
+from figures import line_chart, bar_gender_faceted, bar_medals, scatter_geo, paralympic_db
+from paralympics_common.background import background_callback_manager, optional_background_callback
+from paralympics_common.events import get_event
+from paralympics_common.geo import is_clustered, map_zoom
+from paralympics_common.rest_client import rest_client
+from paralympics_common.sync import change_feed
 
 external_stylesheets = [dbc.themes.BOOTSTRAP]
 meta_tags = [
     {"name": "viewport", "content": "width=device-width, initial-scale=1"},
 ]
-app = Dash(__name__, external_stylesheets=external_stylesheets, meta_tags=meta_tags)
+# A callback with background=True runs in a separate process so that a slow callback does not block the web worker,
+# see paralympics_common/background.py
+app = Dash(__name__, external_stylesheets=external_stylesheets, meta_tags=meta_tags,
+           background_callback_manager=background_callback_manager())
 
 # Create the Plotly Express line chart object, e.g. to show number of sports
 line = line_chart("sports")
@@ -21,6 +28,15 @@ bar = bar_gender_faceted(["winter"])
 # Create the scatter map
 map = scatter_geo()
 
+# Create the stacked bar chart of medals won by the top teams
+medals = bar_medals()
+
+# Start loading the events from the REST API in the background so hovering over a marker does not wait for the network
+rest_client.prefetch()
+
+# Apply events changed through the REST API to the charts and cards as soon as the REST API sends a notification
+change_feed.start()
+
 
 # Layout variables
 
@@ -37,11 +53,9 @@ def create_card(event_id):
     Returns:
         card: dash boostrap components card for the event
     """
-    # Use python requests to access your REST API on your localhost
+    # Use the shared REST API client, which reuses connections and caches the events
     # Make sure you run the REST APP first and check your port number if you changed it from the default 5000
-    url = f"http://127.0.0.1:5000/events/{event_id}"
-    event_response = requests.get(url)
-    ev = event_response.json()
+    ev = rest_client.get_event(event_id)
 
     # Variables for the card contents
     logo = f"logos/{ev['year']}_{ev['host']}.jpg"
@@ -75,7 +89,7 @@ def create_card_from_df(event_id):
     """
     Generate a card for the event specified by event_id.
 
-    Uses the DataFrame.
+    Uses the events read from the CSV file, which are looked up by id rather than reading the file for each card.
 
     Args:
         event_id:
@@ -83,10 +97,7 @@ def create_card_from_df(event_id):
     Returns:
         card: dash boostrap components card for the event
     """
-
-    #
-    df_events = pd.read_csv(event_data)
-    ev = df_events.iloc[event_id - 1]
+    ev = get_event(event_id)
 
     # Variables for the card contents
     logo = f"logos/{ev['year']}_{ev['host']}.jpg"
@@ -172,25 +183,41 @@ row_three = dbc.Row([
 
 row_four = dbc.Row([
     dbc.Col(children=[
-        dcc.Graph(id="map", figure=map)
+        dcc.Graph(id="map", figure=map),
+        # Progress of the background job that groups the markers for the zoom level
+        html.Div(id='map-status', className="text-muted small"),
         # html.Img(src=app.get_asset_url('map-placeholder.png'), className="img-fluid"),
     ], width=8, align="start"),
     dbc.Col(children=[
         html.Br(),
+        # Progress of the background job that gets the event for the card
+        html.Div(id='card-status', className="text-muted small"),
         html.Div(id='card'),
+        # Holds the id of the event in the card, set by the clientside hover callback
+        dcc.Store(id='hover-event-id'),
     ], width=4, align="start"),
 ])
 
+row_five = dbc.Row([
+    dbc.Col(children=[
+        dcc.Graph(id="medals", figure=medals),
+    ], width=12),
+], align="start")
+
 app.layout = dbc.Container([
     row_one,
     row_two,
     row_three,
     row_four,
+    row_five,
 ])
 
+# The line and bar charts are built from the events in memory in a few milliseconds, so they run in the web worker.
+# A background callback would fork a process for each one and make the browser wait for its next poll of the result.
 @app.callback(
     Output(component_id='line', component_property='figure'),
-    Input(component_id='type-dropdown', component_property='value')
+    Input(component_id='type-dropdown', component_property='value'),
+    running=[(Output('line', 'style'), {'opacity': 0.5}, {'opacity': 1})]
 )
 def update_line_chart(chart_type):
     figure = line_chart(chart_type)
@@ -198,21 +225,63 @@ def update_line_chart(chart_type):
 
 @app.callback(
     Output(component_id='bar', component_property='figure'),
-    Input(component_id='checklist-input', component_property='value')
+    Input(component_id='checklist-input', component_property='value'),
+    running=[(Output('bar', 'style'), {'opacity': 0.5}, {'opacity': 1})]
 )
 def update_bar_chart(event_type):
     figure = bar_gender_faceted(event_type)
     return figure
 
-@app.callback(
+# The markers only change with the zoom level when there are too many events to show each one. Then grouping them for
+# a new zoom level reads every location, so it runs in a background job that a newer zoom or pan cancels.
+@optional_background_callback(
+    app,
+    Output(component_id='map', component_property='figure'),
+    Input(component_id='map', component_property='relayoutData'),
+    background=is_clustered(paralympic_db),
+    progress=Output('map-status', 'children'),
+    cancel=Input('map', 'relayoutData'),
+    prevent_initial_call=True,
+    running=[(Output('map', 'style'), {'opacity': 0.5}, {'opacity': 1})]
+)
+def zoom_map(set_progress, relayout_data):
+    if not relayout_data or not is_clustered(paralympic_db):
+        raise PreventUpdate
+    scale = relayout_data.get('geo.projection.scale')
+    if scale is None:
+        raise PreventUpdate
+    center = None
+    if 'geo.center.lat' in relayout_data and 'geo.center.lon' in relayout_data:
+        center = (relayout_data['geo.center.lat'], relayout_data['geo.center.lon'])
+    zoom = map_zoom(scale)
+    set_progress(f"Grouping the events for zoom level {zoom}")
+    return scatter_geo(zoom=zoom, center=center)
+
+# Runs in the browser (see assets/hover.js). Waits until the mouse rests on a marker and only updates the store when
+# the event id changes, so sweeping the mouse across the map does not send a request for every marker passed over.
+app.clientside_callback(
+    ClientsideFunction(namespace='hover', function_name='event_id'),
+    Output('hover-event-id', 'data'),
+    Input('map', 'hoverData'),
+    State('hover-event-id', 'data'),
+)
+
+# The card gets the event from the REST API over HTTP, so it runs in a background job unless the app is mounted on the
+# REST API's server (paralympics_server), which reads the event in the same process. When the mouse rests on another
+# marker the job for the previous one is cancelled, so the server does not keep working on a card that is not shown.
+@optional_background_callback(
+    app,
     Output('card', 'children'),
-    Input('map', 'hoverData')
+    Input('hover-event-id', 'data'),
+    background=not rest_client.is_local,
+    progress=Output('card-status', 'children'),
+    cancel=Input('hover-event-id', 'data'),
+    running=[(Output('card', 'style'), {'opacity': 0.5}, {'opacity': 1})]
 )
-def display_card(hover_data):
-    if hover_data is not None:
-        event_id = hover_data['points'][0]['customdata'][0]
-        if event_id is not None:
-            return create_card(event_id)
+def display_card(set_progress, event_id):
+    if event_id is not None:
+        set_progress(f"Loading event {event_id}")
+        return create_card(event_id)
 
 if __name__ == '__main__':
     app.run(debug=True, port=8050)
@@ -0,0 +1,86 @@
+"""Measures the time to import the multi-page app, to serve its first request and to display each page.
+
+The page layouts are built the first time each page is displayed and then cached until the data changes (see
+layout_charts.py and layout_events.py), so importing the app and serving its first request should not create any
+figures. Each measurement is made in a new process so that nothing has been imported or cached before it starts:
+
+- import libraries: importing dash, pandas and plotly, which the app needs whatever it does
+- import app: importing paralympics_app after the libraries, the app's own work
+- first request: the first GET / served by the app, before any page is displayed
+- first display: the page content for each page, returned by the Dash pages callback, the first time it is displayed
+- cached display: the mean time to display the page again, from the cached layout
+
+The requests are made with the Flask test client, so the timings do not include the network.
+
+To run the benchmark:
+
+    python -m paralympics_dash_multi.benchmark
+"""
+import multiprocessing
+import time
+
+# Paths of the pages in dash.page_registry
+PAGES = ("/", "/charts")
+
+
+def run(repeats=5, requests=100):
+    """Prints the median of each timing over the repeats, each repeat in a new process."""
+    context = multiprocessing.get_context("spawn")
+    timings = []
+    for _ in range(repeats):
+        results = context.Queue()
+        process = context.Process(target=_measure, args=(requests, results))
+        process.start()
+        timings.append(results.get())
+        process.join()
+    print(f"{'':>26} {'ms':>9}")
+    for name in timings[0]:
+        values = sorted(timing[name] for timing in timings)
+        print(f"{name:>26} {values[len(values) // 2] * 1000:>9.2f}")
+
+
+def _measure(requests, results):
+    """Imports and runs the app and sends its timings to results."""
+    timings = {}
+    start = time.perf_counter()
+    import dash  # noqa: F401
+    import pandas  # noqa: F401
+    import plotly.express  # noqa: F401
+    timings["import libraries"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    from paralympics_dash_multi.paralympics_app import app
+    timings["import app"] = time.perf_counter() - start
+
+    client = app.server.test_client()
+    start = time.perf_counter()
+    client.get("/").get_data()
+    timings["first request"] = time.perf_counter() - start
+
+    for path in PAGES:
+        start = time.perf_counter()
+        _display_page(client, path)
+        timings[f"first display {path}"] = time.perf_counter() - start
+    for path in PAGES:
+        start = time.perf_counter()
+        for _ in range(requests):
+            _display_page(client, path)
+        timings[f"cached display {path}"] = (time.perf_counter() - start) / requests
+    results.put(timings)
+
+
+def _display_page(client, path):
+    """Calls the Dash pages callback that returns the content of the page at the path, as the browser does."""
+    response = client.post("/_dash-update-component", json={
+        "output": ".._pages_content.children..._pages_store.data..",
+        "outputs": [{"id": "_pages_content", "property": "children"}, {"id": "_pages_store", "property": "data"}],
+        "inputs": [{"id": "_pages_location", "property": "pathname", "value": path},
+                   {"id": "_pages_location", "property": "search", "value": ""}],
+        "changedPropIds": ["_pages_location.pathname"],
+        "state": [],
+    })
+    assert response.status_code == 200, response.status_code
+
+
+if __name__ == '__main__':
+    run()
@@ -1,15 +1,22 @@
-import json
-import sqlite3
 from pathlib import Path
 
-import pandas as pd
 import plotly.express as px
-import requests
+
+from paralympics_common.data_version import get_data_version
+from paralympics_common.events import get_event, get_events_frame
+from paralympics_common.geo import get_event_locations
+from paralympics_common.medals import get_medal_table
+from paralympics_common.rest_client import rest_client
 
 event_data = Path(__file__).parent.parent.parent.joinpath("data", "paralympic_events.csv")
 paralympic_db = Path(__file__).parent.joinpath("paralympics.sqlite")
 
 
+def data_version():
+    """ Returns the version of the data used by the figures, page layouts are cached until it changes."""
+    return get_data_version(event_data, paralympic_db)
+
+
 def get_event_data(event_id, method):
     """
     Load paralympic event details for a specific event.
@@ -20,22 +27,16 @@ def get_event_data(event_id, method):
         method: Get the event from REST API (rest) or pandas DataFrame (pandas),
 
     Returns:
-        ev: data for one event as a json string
+        ev: dictionary of the data for one event
     """
     if method == "rest":
-        # Use python requests to access your REST API on your localhost
+        # Use the shared REST API client, which reuses connections and caches the events
         # Make sure you run the REST APP first and check your port number if you changed it from the default 5000
-        url = f"http://127.0.0.1:5000/events/{event_id}"
-        event_response = requests.get(url)
-        ev = event_response.json()
+        ev = rest_client.get_event(event_id)
         return ev
     elif method == "pandas":
-        row_num = event_id + 1
-        df_events = pd.read_csv(event_data)
-        row = df_events.iloc[row_num]
-        # pandas method to convert the row, which is a Series, to json
-        ev_json = row.to_json(double_precision=0, orient="index")
-        ev = json.loads(ev_json)
+        # The events are read from the CSV once and then looked up by id, the ids are the same as the REST API ids
+        ev = get_event(event_id)
         return ev
     else:
         raise ValueError(f'method must be one of ["rest", "pandas"]')
@@ -62,9 +63,9 @@ def line_chart(feature):
         # Make sure it is lowercase to match the dataframe column names
         feature = feature.lower()
 
-    # Read the data from pandas into a dataframe
+    # Read only the columns needed from the columnar copy of the CSV file into a dataframe
     cols = ["type", "year", "host", "events", "sports", "participants", "countries"]
-    line_chart_data = pd.read_csv(event_data, usecols=cols)
+    line_chart_data = get_events_frame(columns=cols)
 
     # Set the title for the chart using the value of 'feature'
     title_text = f"How has the number of {feature} changed over time?"
@@ -100,7 +101,7 @@ def bar_gender(event_type):
     :return: Plotly Express bar chart
     """
     cols = ['type', 'year', 'host', 'participants_m', 'participants_f', 'participants']
-    df_events = pd.read_csv(event_data, usecols=cols)
+    df_events = get_events_frame(columns=cols)
     # Drop Rome as there is no male/female data
     df_events.drop([0], inplace=True, )
     df_events.reset_index(drop=True)
@@ -125,21 +126,31 @@ def bar_gender(event_type):
     return fig
 
 
+def bar_medals(event_type=None, top=10):
+    """
+    Creates a stacked bar chart of the gold, silver and bronze medals won by the teams with the most gold medals.
+
+    The medals are read from the medal table in the database, see paralympics_common/medals.py.
+
+    :param event_type: str summer or winter, or None for the total of both
+    :param top: int number of teams to show
+    :return: Plotly Express bar chart
+    """
+    df_medals = get_medal_table(paralympic_db, event_type).head(top)
+    fig = px.bar(df_medals,
+                 x='team',
+                 y=['gold', 'silver', 'bronze'],
+                 title='Which teams have won the most medals?',
+                 labels={'team': '', 'value': '', 'variable': ''},
+                 color_discrete_map={'gold': 'gold', 'silver': 'silver', 'bronze': 'peru'},
+                 template="simple_white"
+                 )
+    return fig
+
+
 def scatter_geo():
-    # create database connection
-    connection = sqlite3.connect(paralympic_db)
-
-    # define the sql query
-    sql = '''
-        SELECT event.id, event.host, event.year, location.lat, location.lon
-        FROM event
-        JOIN location ON event.host = location.city 
-        '''
-
-    df_locs = pd.read_sql(sql=sql, con=connection, index_col=None)
-    df_locs['lon'] = df_locs['lon'].astype(float)
-    df_locs['lat'] = df_locs['lat'].astype(float)
-    df_locs['name'] = df_locs['host'] + ' ' + df_locs['year'].astype(str)
+    # Event locations are read once from the database and then cached
+    df_locs = get_event_locations(paralympic_db)
 
     fig = px.scatter_geo(df_locs,
                          lat=df_locs.lat,
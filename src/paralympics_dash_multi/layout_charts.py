@@ -1,13 +1,13 @@
-""" Contains variables for all the rows and elements in the 'charts' page """
-import dash_bootstrap_components as dbc
-from dash import html, dcc, get_asset_url
-from paralympics_dash_multi.figures import line_chart, bar_gender
+""" Contains variables for all the rows and elements in the 'charts' page
 
-# Create the Plotly Express line chart object, e.g. to show number of sports
-line = line_chart("sports")
+The rows that contain figures are created by the layout() function the first time the page is displayed, rather than
+when the module is imported, and are then cached until the data changes.
+"""
+from functools import lru_cache
 
-# Create the Plotly Express stacked bar chart object to show gender split of participants for the type of event
-bar = bar_gender("winter")
+import dash_bootstrap_components as dbc
+from dash import html, dcc, get_asset_url
+from paralympics_dash_multi.figures import line_chart, bar_gender, bar_medals, data_version
 
 line_chart_dropdown = dbc.Select(
     id="type-dropdown",  # id uniquely identifies the element, will be needed later
@@ -38,21 +38,60 @@ row_one = html.Div(
     ]),
 )
 
-row_two = html.Div(
-    dbc.Row([
-        dbc.Col(children=[
-            line_chart_dropdown
-        ], width=2),
-        dbc.Col(children=[
-            # Chart replaced the placeholder image
-            dcc.Graph(figure=line, id="line-chart"),
-        ], width=4),
-        dbc.Col(children=[
-            type_checklist,
-        ], width=2),
-        dbc.Col(children=[
-            # Chart replaced the placeholder image
-            dcc.Graph(figure=bar, id="bar-chart"),
-        ], width=4),
-    ], align="start")
-)
+
+def layout(**kwargs):
+    """ Returns the layout of the charts page, used as the page layout by Dash when the page is displayed.
+
+    Args:
+        kwargs: query string parameters of the page URL, passed by Dash but not used
+
+    Returns:
+        layout: dash bootstrap components Container with the rows of the page
+    """
+    return _layout(data_version())
+
+
+@lru_cache(maxsize=1)
+def _layout(version):
+    """ Creates the rows for the data version, only the layout for the latest version is kept """
+    # Create the Plotly Express line chart object, e.g. to show number of sports
+    line = line_chart("sports")
+
+    # Create the Plotly Express stacked bar chart object to show gender split of participants for the type of event
+    bar = bar_gender("winter")
+
+    # Create the stacked bar chart of medals won by the top teams
+    medals = bar_medals()
+
+    row_two = html.Div(
+        dbc.Row([
+            dbc.Col(children=[
+                line_chart_dropdown
+            ], width=2),
+            dbc.Col(children=[
+                # Chart replaced the placeholder image
+                dcc.Graph(figure=line, id="line-chart"),
+            ], width=4),
+            dbc.Col(children=[
+                type_checklist,
+            ], width=2),
+            dbc.Col(children=[
+                # Chart replaced the placeholder image
+                dcc.Graph(figure=bar, id="bar-chart"),
+            ], width=4),
+        ], align="start")
+    )
+
+    row_three = html.Div(
+        dbc.Row([
+            dbc.Col(children=[
+                dcc.Graph(figure=medals, id="medals-chart"),
+            ], width=12),
+        ], align="start")
+    )
+
+    return dbc.Container([
+        row_one,
+        row_two,
+        row_three,
+    ])
@@ -1,10 +1,13 @@
-""" Contains variables for all the rows and elements in the 'charts' page """
+""" Contains variables for all the rows and elements in the 'charts' page
+
+The map and card are created by the layout() function the first time the page is displayed, rather than when the
+module is imported, and are then cached until the data changes.
+"""
+from functools import lru_cache
+
 import dash_bootstrap_components as dbc
 from dash import html, dcc, get_asset_url
-from paralympics_dash_multi.figures import scatter_geo, get_event_data
-
-# Create the scatter map
-map = scatter_geo()
+from paralympics_dash_multi.figures import scatter_geo, get_event_data, data_version
 
 
 def create_card(event_id, method):
@@ -51,15 +54,6 @@ def create_card(event_id, method):
     return card
 
 
-# Create a specific instance of the card using the data for the event with id 12
-# This will be replaced next week with a dynamic input using a callback
-
-# Create the card using data from REST API, the REST app must be running on port 5000
-# card = create_card(12, method="rest")
-
-# This version uses the dataframe instead of REST API so that you don't have to run the Flask REST API app
-card = create_card(12, method="pandas")
-
 row_one = html.Div(
     dbc.Row([
         dbc.Col([html.H1("Event Details"), html.P(
@@ -68,14 +62,47 @@ row_one = html.Div(
     ]),
 )
 
-row_two = html.Div(
-    dbc.Row([
-        dbc.Col(children=[
-            # Chart replaced the placeholder image
-            dcc.Graph(figure=map, id="geo-map"),
-        ], width=8),
-        dbc.Col(children=[
-            card,
-        ], width=4),
-    ], align="start")
-)
+
+def layout(**kwargs):
+    """ Returns the layout of the events page, used as the page layout by Dash when the page is displayed.
+
+    Args:
+        kwargs: query string parameters of the page URL, passed by Dash but not used
+
+    Returns:
+        layout: dash bootstrap components Container with the rows of the page
+    """
+    return _layout(data_version())
+
+
+@lru_cache(maxsize=1)
+def _layout(version):
+    """ Creates the rows for the data version, only the layout for the latest version is kept """
+    # Create the scatter map
+    map = scatter_geo()
+
+    # Create a specific instance of the card using the data for the event with id 12
+    # This will be replaced next week with a dynamic input using a callback
+
+    # Create the card using data from REST API, the REST app must be running on port 5000
+    # card = create_card(12, method="rest")
+
+    # This version uses the dataframe instead of REST API so that you don't have to run the Flask REST API app
+    card = create_card(12, method="pandas")
+
+    row_two = html.Div(
+        dbc.Row([
+            dbc.Col(children=[
+                # Chart replaced the placeholder image
+                dcc.Graph(figure=map, id="geo-map"),
+            ], width=8),
+            dbc.Col(children=[
+                card,
+            ], width=4),
+        ], align="start")
+    )
+
+    return dbc.Container([
+        row_one,
+        row_two,
+    ])
@@ -2,6 +2,8 @@ import dash
 import dash_bootstrap_components as dbc
 from dash import Dash, html
 
+from paralympics_common.sync import change_feed
+
 # Variable that contains the external_stylesheet to use, in this case Bootstrap styling from dash bootstrap
 # components (dbc)
 external_stylesheets = [dbc.themes.BOOTSTRAP]
@@ -12,26 +14,43 @@ meta_tags = [
 ]
 
 # Pass the stylesheet variable to the Dash app constructor
-app = Dash(__name__, external_stylesheets=external_stylesheets, meta_tags=meta_tags, use_pages=True)
-
-# From https://dash-bootstrap-components.opensource.faculty.ai/docs/components/navbar/
-navbar = dbc.NavbarSimple(
-    children=[
-        dbc.NavItem(dbc.NavLink("Event Details", href=dash.page_registry['pages.events']['path'])),
-        dbc.NavItem(dbc.NavLink("Charts", href=dash.page_registry['pages.charts']['path'])),
-    ],
-    brand="Paralympics Dashboard",
-    brand_href="#",
-    color="primary",
-    dark=True,
-)
-
-app.layout = html.Div([
-    # Nav bar
-    navbar,
-    # Area where the page content is displayed
-    dash.page_container
-])
+# Dash would otherwise check the callbacks by building the layout of every page on the first request, so the figures
+# of pages that are never viewed would be created. The page layouts are only built when a page is displayed.
+app = Dash(__name__, external_stylesheets=external_stylesheets, meta_tags=meta_tags, use_pages=True,
+           suppress_callback_exceptions=True)
+
+
+def serve_layout():
+    """Returns the app layout, a function so the links use the URL prefix the app is served under.
+
+    The app is served from / when run on its own, and from /multi/ on the combined server in paralympics_server.
+    """
+    # From https://dash-bootstrap-components.opensource.faculty.ai/docs/components/navbar/
+    navbar = dbc.NavbarSimple(
+        children=[
+            dbc.NavItem(dbc.NavLink("Event Details",
+                                    href=dash.get_relative_path(dash.page_registry['pages.events']['path']))),
+            dbc.NavItem(dbc.NavLink("Charts",
+                                    href=dash.get_relative_path(dash.page_registry['pages.charts']['path']))),
+        ],
+        brand="Paralympics Dashboard",
+        brand_href="#",
+        color="primary",
+        dark=True,
+    )
+
+    return html.Div([
+        # Nav bar
+        navbar,
+        # Area where the page content is displayed
+        dash.page_container
+    ])
+
+
+# Apply events changed through the REST API when it sends a notification, page layouts are rebuilt if the data changed
+change_feed.start()
+
+app.layout = serve_layout
 
 if __name__ == '__main__':
     app.run(debug=True, port=8051)
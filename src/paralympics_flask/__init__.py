@@ -4,7 +4,8 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 
-from paralympics_flask.utilities import add_data
+from paralympics_common.db import dispose_after_fork, set_sqlite_pragmas
+from paralympics_flask.config import CONFIGS
 
 
 class Base(DeclarativeBase):
@@ -14,26 +15,50 @@ class Base(DeclarativeBase):
 db = SQLAlchemy(model_class=Base)
 
 
-def create_app(test_config=None):
+def create_app(test_config=None, config_class=None):
+    """Create and configure the Flask app
+
+    Args:
+    test_config: dictionary of config values that override those of the config class
+    config_class: configuration class or its name in config.CONFIGS, by default the PARALYMPICS_CONFIG environment
+        variable or development (see config.py)
+
+    Returns:
+    Configured Flask app
+    """
     app = Flask(__name__, instance_relative_config=True)
-    app.config.from_mapping(
-        SECRET_KEY='create-your-own-key',
-        SQLALCHEMY_DATABASE_URI="sqlite:///" + os.path.join(app.instance_path, 'paralympics_flask.sqlite'),
-        SQLALCHEMY_ECHO=True
-    )
+    if config_class is None:
+        config_class = os.environ.get("PARALYMPICS_CONFIG", "development")
+    if isinstance(config_class, str):
+        config_class = CONFIGS[config_class]
+    app.config.from_object(config_class)
+    app.config.from_prefixed_env()
     if test_config:
         app.config.from_mapping(test_config)
+    if not app.config["SECRET_KEY"]:
+        raise RuntimeError("SECRET_KEY is not set, set it with the FLASK_SECRET_KEY environment variable")
+    if not app.config["SQLALCHEMY_DATABASE_URI"]:
+        app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + os.path.join(app.instance_path,
+                                                                             'paralympics_flask.sqlite')
     try:
         os.makedirs(app.instance_path)
     except OSError:
         pass
 
     db.init_app(app)
+    dispose_after_fork(db, app)
 
     from paralympics_flask.models import User, Event, Region
+    from paralympics_flask.utilities import add_data, seed_command
+    app.cli.add_command(seed_command)
+
     with app.app_context():
-        db.create_all()
-        add_data(db)
+        set_sqlite_pragmas(db.engine, app.config["SQLITE_PRAGMAS"])
+
+        # In production the seed command does this once, rather than every time a server process starts
+        if app.config["SEED_ON_STARTUP"]:
+            db.create_all()
+            add_data(db)
 
         from paralympics_flask import views
 
@@ -0,0 +1,45 @@
+"""Serves the plotly.js library that the charts need as a separate file that browsers can cache.
+
+The Plotly package includes plotly.min.js, which is almost 5 MB. Rather than put a copy in every chart page, the page
+loads it with a script tag. The URL includes a fingerprint of the file contents, e.g.
+/assets/plotly-3f2a9c1b7d4e.min.js, so the response can be cached by the browser for a year: a new version of Plotly
+has a new fingerprint and so a new URL.
+
+Use plotly_js_url() for the src of the script tag.
+"""
+import hashlib
+from functools import lru_cache
+from pathlib import Path
+
+import plotly
+from flask import abort, current_app as app, send_file, url_for
+
+PLOTLY_JS = Path(plotly.__file__).parent.joinpath("package_data", "plotly.min.js")
+
+# One year, the longest time browsers are asked to cache a response
+ONE_YEAR = 365 * 24 * 60 * 60
+
+
+@lru_cache(maxsize=1)
+def plotly_js_fingerprint():
+    """Returns the first 12 characters of the SHA-256 hash of plotly.min.js."""
+    return hashlib.sha256(PLOTLY_JS.read_bytes()).hexdigest()[:12]
+
+
+def plotly_js_url():
+    """Returns the fingerprinted URL of plotly.min.js."""
+    return url_for("plotly_js", fingerprint=plotly_js_fingerprint())
+
+
+@app.get("/assets/plotly-<fingerprint>.min.js")
+def plotly_js(fingerprint):
+    """Returns plotly.min.js with headers that let browsers and proxies keep it for a year without checking again.
+
+    Returns 404 for any fingerprint except the current one, so an old URL is never cached with the new file.
+    """
+    if fingerprint != plotly_js_fingerprint():
+        abort(404)
+    response = send_file(PLOTLY_JS, mimetype="text/javascript", max_age=ONE_YEAR, etag=plotly_js_fingerprint())
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
@@ -0,0 +1,86 @@
+"""Measures the time to create the app and to handle requests with the development and production configs.
+
+The development config logs every SQL statement and creates the tables and checks the data when the app starts, the
+production config does neither (see config.py). Each config is measured in a new process so that nothing is shared
+between them, using a copy of the database made with the seed command. The SQL log is written to a discarded stdout,
+so its cost is included without it being shown.
+
+The requests are made with the Flask test client, so the timings do not include the network:
+
+- event page (uncached): an event page with the fragment cache emptied first, so the event is queried each time
+- home page (cached): the home page served from the fragment cache
+
+To run the benchmark:
+
+    python -m paralympics_flask.benchmark
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+
+def run(configs=("development", "production"), requests=1000):
+    """Prints the startup time and the mean time per request for each config."""
+    with tempfile.TemporaryDirectory() as folder:
+        uri = "sqlite:///" + os.path.join(folder, "paralympics_flask.sqlite")
+        context = multiprocessing.get_context("spawn")
+        # Create and seed the database once, so every config starts with the same data
+        seed = context.Process(target=_seed, args=(uri,))
+        seed.start()
+        seed.join()
+        print(f"{'config':>12} {'startup ms':>11} {'event page (uncached) ms':>25} {'home page (cached) ms':>22}")
+        for name in configs:
+            results = context.Queue()
+            process = context.Process(target=_measure, args=(name, uri, requests, results))
+            process.start()
+            startup, uncached, cached = results.get()
+            process.join()
+            print(f"{name:>12} {startup * 1000:>11.1f} {uncached * 1000:>25.3f} {cached * 1000:>22.3f}")
+
+
+def _seed(uri):
+    from paralympics_flask import create_app
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": uri, "SQLALCHEMY_ECHO": False, "SECRET_KEY": "benchmark"},
+                     config_class="production")
+    app.test_cli_runner().invoke(args=["seed"])
+
+
+def _measure(name, uri, requests, results):
+    """Creates the app with the config and sends its timings to results."""
+    # Discard the SQL log, the handler SQLAlchemy adds for echo writes to sys.stdout as it was when the app was created
+    sys.stdout = open(os.devnull, "w")
+    from paralympics_flask import create_app
+    from paralympics_flask.fragments import event_fragment
+    # Import the libraries the views use first, so the startup time is the app's own work and not the imports
+    import pandas  # noqa: F401
+    import plotly.express  # noqa: F401
+
+    start = time.perf_counter()
+    app = create_app({"SQLALCHEMY_DATABASE_URI": uri, "SECRET_KEY": "benchmark"}, config_class=name)
+    startup = time.perf_counter() - start
+    client = app.test_client()
+
+    def event_page():
+        event_fragment.cache_clear()
+        client.get("/events/3").get_data()
+
+    def home_page():
+        client.get("/").get_data()
+
+    results.put((startup, _time(event_page, requests), _time(home_page, requests)))
+
+
+def _time(f, calls):
+    """Returns the mean number of seconds a call to f takes, after one call to warm up."""
+    f()
+    start = time.perf_counter()
+    for _ in range(calls):
+        f()
+    return (time.perf_counter() - start) / calls
+
+
+if __name__ == '__main__':
+    run()
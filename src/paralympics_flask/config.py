@@ -0,0 +1,70 @@
+"""Flask configuration.
+
+create_app() uses the class named by its config_class argument, or by the PARALYMPICS_CONFIG environment variable,
+e.g. PARALYMPICS_CONFIG=production. The default is development. Any value can then be overridden with an environment
+variable starting FLASK_, e.g. FLASK_EVENTS_PER_PAGE=50.
+
+In production the secret key must be set with the FLASK_SECRET_KEY environment variable, e.g. to the value printed by
+python -c "import secrets; print(secrets.token_urlsafe())". The tables are not created and the data is not added when
+the app starts. Do that once with:
+
+    flask --app paralympics_flask seed
+"""
+from paralympics_common.db import pool_options
+
+
+class Config:
+    """Base config."""
+
+    SECRET_KEY = "create-your-own-key"
+    # The database is in the instance folder unless a URI is given, see create_app()
+    SQLALCHEMY_DATABASE_URI = None
+    # Log every SQL statement, only useful while developing as each one is formatted and written to stdout
+    SQLALCHEMY_ECHO = False
+    # Create the tables and add the data when the app is created, otherwise use the seed command
+    SEED_ON_STARTUP = True
+    # PRAGMA statements run on each new SQLite connection, see create_app()
+    SQLITE_PRAGMAS = {}
+    # Number of events on each page of the home page
+    EVENTS_PER_PAGE = 20
+
+
+class ProdConfig(Config):
+    """Production config."""
+
+    # Must be set in the environment, create_app() raises an error if it is not
+    SECRET_KEY = None
+    SQLALCHEMY_ECHO = False
+    SEED_ON_STARTUP = False
+    SQLALCHEMY_ENGINE_OPTIONS = pool_options()
+    SQLITE_PRAGMAS = {
+        # Readers carry on while another connection writes
+        "journal_mode": "WAL",
+        # Safe with WAL, the database cannot be corrupted, only the last commits lost if the power fails
+        "synchronous": "NORMAL",
+        # Up to 16 MB of pages cached by each connection, a negative value is in KiB
+        "cache_size": -16000,
+        "temp_store": "MEMORY",
+    }
+
+
+class DevConfig(Config):
+    """Development config"""
+
+    DEBUG = True
+    SQLALCHEMY_ECHO = True
+
+
+class TestConfig(Config):
+    """Testing config"""
+
+    TESTING = True
+    WTF_CSRF_ENABLED = False
+
+
+# Names that can be given to create_app() or in PARALYMPICS_CONFIG
+CONFIGS = {
+    "development": DevConfig,
+    "testing": TestConfig,
+    "production": ProdConfig,
+}
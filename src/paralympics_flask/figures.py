@@ -1,37 +1,55 @@
-import json
+from functools import lru_cache
 
-import plotly
 import plotly.express as px
 import pandas as pd
+from sqlalchemy import select
 
+from paralympics_common.data_version import get_database_version
 from paralympics_flask.models import Event
 
+# Columns that line_chart() can show
+LINE_CHART_FEATURES = ["sports", "participants", "events", "countries"]
+
+# One statement per feature with only the columns the line chart uses, rather than loading every Event object
+_line_chart_selects = {
+    feature: select(Event.type, Event.year, getattr(Event, feature)).order_by(Event.year)
+    for feature in LINE_CHART_FEATURES
+}
+
 
 def line_chart(feature, db):
-    """ Creates a line chart with data from paralympics_events.csv
+    """ Creates a line chart with data from the event table
 
     Data is displayed over time from 1960 onwards.
     The figure shows separate trends for the winter and summer events.
 
+    The HTML is cached until the data in the database changes, so the query and figure are only made once per
+    feature.
+    The page must load plotly.js itself, see assets.py.
+
      Parameters
      feature: events, sports, countries or participants
+     db: SQLAlchemy database for the app
 
      Returns
-     fig: Plotly Express line figure
+     plotly_jinja_data: dictionary with the HTML of the figure in 'fig'
      """
 
     # take the feature parameter from the function and check it is valid
-    if feature not in ["sports", "participants", "events", "countries"]:
+    if feature not in LINE_CHART_FEATURES:
         raise ValueError(
             'Invalid value for "feature". Must be one of ["sports", "participants", "events", "countries"]')
-    else:
-        # Make sure it is lowercase to match the dataframe column names
-        feature = feature.lower()
 
-    # Get the data from the database which returns Event objects
-    events = db.session.execute(db.select(Event)).scalars()
-    # Create a dataframe from the Event objects
-    line_chart_df = pd.DataFrame([vars(e) for e in events])
+    # The version changes when a change to the database is committed
+    version = get_database_version(db.engine)
+    return {"fig": _line_chart_html(feature, db, version)}
+
+
+@lru_cache(maxsize=16)
+def _line_chart_html(feature, db, version):
+    # Get the type, year and feature columns from the database
+    with db.engine.connect() as connection:
+        line_chart_df = pd.read_sql(_line_chart_selects[feature], connection)
 
     # Set the title for the chart using the value of 'feature'
     title_text = f"How has the number of {feature} changed over time?"
@@ -55,6 +73,5 @@ def line_chart(feature, db):
                   template="simple_white"
                   )
 
-    # Convert to a format that can be transmitted to the web page
-    plotly_jinja_data = {"fig": fig.to_html(full_html=False, include_plotlyjs=True)}
-    return plotly_jinja_data
+    # Convert to HTML for the web page, without plotly.js which the page loads from a cached file
+    return fig.to_html(full_html=False, include_plotlyjs=False)
@@ -0,0 +1,104 @@
+"""Rendered HTML fragments of the event pages, cached until the data changes.
+
+The list of events on the home page and the details on an event page are only queried and rendered the first time
+they are requested for each version of the data, see paralympics_common/data_version.py. The version changes when a
+change to the database is committed. Only the fragments are cached, the rest of the page, e.g. flashed messages, is
+rendered for each request.
+
+The home page shows one page of events at a time, so the work to render it does not grow with the number of events.
+Only the columns the list shows are selected from the event table.
+
+Each page also has an ETag, a hash of the cached fragment made when it is rendered. It is the same in every worker
+process for the same data, and changes whenever the fragment does. A browser that sends the ETag back in If-None-Match
+gets a 304 Not Modified response without the page being rendered again.
+"""
+import hashlib
+import math
+from collections import namedtuple
+from functools import lru_cache
+
+from flask import render_template, request
+from sqlalchemy import func, select
+
+from paralympics_common.data_version import get_database_version
+from paralympics_flask import db
+from paralympics_flask.models import Event
+
+# Only the columns shown in the list of events
+_event_list_select = select(Event.id, Event.year, Event.host).order_by(Event.year, Event.id)
+_event_count_select = select(func.count()).select_from(Event)
+
+# The rendered list of events for one page of the home page, and its ETag
+ListFragment = namedtuple("ListFragment", ["html", "etag"])
+
+# The title, rendered details and ETag of an event page
+EventFragment = namedtuple("EventFragment", ["title", "html", "etag"])
+
+
+def data_version():
+    """Returns the version of the data in the database, which changes when a change is committed."""
+    return get_database_version(db.engine)
+
+
+def make_etag(*parts):
+    """Returns an ETag for a response made from the parts, e.g. the title and HTML of the page."""
+    return hashlib.sha256(repr(parts).encode()).hexdigest()[:16]
+
+
+def is_not_modified(etag):
+    """Returns True if the browser already has the response with this ETag, from the If-None-Match header."""
+    return etag in request.if_none_match
+
+
+@lru_cache(maxsize=128)
+def event_list_fragment(page, per_page, version):
+    """Returns the rendered list of events for one page of the home page, or None if there is no such page.
+
+    Args:
+        page: page number, starting at 1
+        per_page: number of events on each page
+        version: data version, part of the cache key
+
+    Returns:
+        ListFragment: HTML of the events and the links to the other pages, and its ETag
+    """
+    total = db.session.execute(_event_count_select).scalar_one()
+    pages = max(1, math.ceil(total / per_page))
+    if page < 1 or page > pages:
+        return None
+    events = db.session.execute(_event_list_select.limit(per_page).offset((page - 1) * per_page)).all()
+    html = render_template('_event_list.html', events=events, page=page, pages=pages,
+                           page_numbers=page_links(page, pages))
+    return ListFragment(html=html, etag=make_etag('index', html))
+
+
+def page_links(page, pages, around=2):
+    """Returns the page numbers to link to: the first, the last and those near the current page, so the number of
+    links stays the same however many pages there are. None marks a gap.
+    """
+    numbers = sorted({1, pages, *range(max(1, page - around), min(pages, page + around) + 1)})
+    links = []
+    for number in numbers:
+        if links and number > links[-1] + 1:
+            links.append(None)
+        links.append(number)
+    return links
+
+
+@lru_cache(maxsize=256)
+def event_fragment(event_id, version):
+    """Returns the title and rendered details of an event, or None if there is no event with the id.
+
+    Args:
+        event_id: id of the event
+        version: data version, part of the cache key
+
+    Returns:
+        EventFragment: the page title, the HTML of the event details and its ETag
+    """
+    event = db.session.get(Event, event_id)
+    if event is None:
+        return None
+    title = f"{event.host} {event.year}"
+    html = render_template('_event.html', event=event)
+    return EventFragment(title=title, html=html, etag=make_etag('event', title, html))
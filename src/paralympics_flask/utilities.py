@@ -1,8 +1,11 @@
 from pathlib import Path
 
+import click
 import pandas as pd
+from flask.cli import with_appcontext
 
-from paralympics_rest.models import Region, Event
+from paralympics_flask import db
+from paralympics_flask.models import Region, Event
 
 
 def add_data(db):
@@ -10,30 +13,36 @@ def add_data(db):
 
     :param db: SQLAlchemy database for the app
     """
-    # Create a connection to the REST API sqlite database using FlaskSQLAlchemy
-    connection = db.engine.connect()
-
-    # If there are no regions in the database, then add them
-    first_region = db.session.execute(db.select(Region)).first()
-    if not first_region:
-        region_file = Path(__file__).parent.parent.parent.joinpath("data", "noc_regions.csv")
-        # Read the noc_regions data to a pandas dataframe
-        na_values = [""]
-        regions_df = pd.read_csv(region_file, keep_default_na=False, na_values=na_values)
-        # Write the values to the database table
-        regions_df.to_sql("region", connection, if_exists="append", index=False)
-
-    # If there are no Events, then add them
-    first_event = db.session.execute(db.select(Event)).first()
-    if not first_event:
-        # Read the paralympics event data to a pandas dataframe
-        event_file = Path(__file__).parent.parent.parent.joinpath("data", "paralympic_events.csv")
-        events_df = pd.read_csv(event_file)
-
-        # Write the pandas DataFrame contents to the database tables
-        # For the event table we want the pandas index, but it needs to start from 1 and not 0
-        events_df.index += 1
-        events_df.to_sql("event", connection, if_exists="append", index_label='id')
-
-    # Close the database connection
-    connection.close()
+    # Borrow a connection from the pool while the data is added, the data is committed when the block ends
+    with db.engine.begin() as connection:
+
+        # If there are no regions in the database, then add them
+        first_region = connection.execute(db.select(Region.NOC).limit(1)).first()
+        if not first_region:
+            region_file = Path(__file__).parent.parent.parent.joinpath("data", "noc_regions.csv")
+            # Read the noc_regions data to a pandas dataframe
+            na_values = [""]
+            regions_df = pd.read_csv(region_file, keep_default_na=False, na_values=na_values)
+            # Write the values to the database table
+            regions_df.to_sql("region", connection, if_exists="append", index=False)
+
+        # If there are no Events, then add them
+        first_event = connection.execute(db.select(Event.id).limit(1)).first()
+        if not first_event:
+            # Read the paralympics event data to a pandas dataframe
+            event_file = Path(__file__).parent.parent.parent.joinpath("data", "paralympic_events.csv")
+            events_df = pd.read_csv(event_file)
+
+            # Write the pandas DataFrame contents to the database tables
+            # For the event table we want the pandas index, but it needs to start from 1 and not 0
+            events_df.index += 1
+            events_df.to_sql("event", connection, if_exists="append", index_label='id')
+
+
+@click.command("seed")
+@with_appcontext
+def seed_command():
+    """Creates the tables and adds the regions and events, if they are not already in the database."""
+    db.create_all()
+    add_data(db)
+    click.echo(f"Seeded {db.engine.url.database}")
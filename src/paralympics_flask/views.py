@@ -1,26 +1,56 @@
-from flask import current_app as app, render_template
+from flask import current_app as app, render_template, request, abort, make_response
 
-from paralympics_flask.figures import line_chart
+from paralympics_flask.assets import plotly_js_url
+from paralympics_flask.figures import LINE_CHART_FEATURES, line_chart
 from paralympics_flask import db
-from paralympics_flask.models import Event
+from paralympics_flask.fragments import data_version, is_not_modified, event_list_fragment, event_fragment
 
 
 @app.route('/', methods=['GET'])
 def index():
-    """ Returns the home page."""
-    events = db.session.execute(db.select(Event).order_by(Event.year)).scalars()
-    return render_template('index.html', events=events)
+    """ Returns the home page with one page of events, the page number is given by ?page= """
+    page = request.args.get('page', 1, type=int)
+    per_page = app.config['EVENTS_PER_PAGE']
+    event_list = event_list_fragment(page, per_page, data_version())
+    if event_list is None:
+        abort(404)
+    if is_not_modified(event_list.etag):
+        return not_modified(event_list.etag)
+    return with_etag(render_template('index.html', event_list=event_list.html), event_list.etag)
 
 
-@app.get('/events/<event_id>')
+@app.get('/events/<int:event_id>')
 def get_event(event_id):
     """ Returns an event details page. """
-    event = db.get_or_404(Event, event_id)
-    return render_template('event.html', event=event)
+    event = event_fragment(event_id, data_version())
+    if event is None:
+        abort(404)
+    if is_not_modified(event.etag):
+        return not_modified(event.etag)
+    return with_etag(render_template('event.html', title=event.title, event_detail=event.html), event.etag)
 
 
 @app.get('/chart')
 def display_chart():
-    """ Returns a page with a line chart. """
-    line_fig_html = line_chart(feature="participants", db=db)
-    return render_template('chart.html', fig_html=line_fig_html)
+    """ Returns a page with a line chart of the participants, or another feature given by ?feature= """
+    feature = request.args.get('feature', 'participants')
+    if feature not in LINE_CHART_FEATURES:
+        abort(404)
+    line_fig_html = line_chart(feature=feature, db=db)
+    return render_template('chart.html', fig_html=line_fig_html, plotly_js=plotly_js_url())
+
+
+def with_etag(html, etag):
+    """ Returns a response with the ETag, that the browser must check is still current before using it again. """
+    response = make_response(html)
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
+
+
+def not_modified(etag):
+    """ Returns an empty 304 response telling the browser to use its copy of the page. """
+    response = make_response('', 304)
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
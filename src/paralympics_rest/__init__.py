@@ -5,6 +5,8 @@ from flask_marshmallow import Marshmallow
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 
+from paralympics_common.db import dispose_after_fork
+
 
 # https://flask-sqlalchemy.palletsprojects.com/en/3.1.x/quickstart/
 class Base(DeclarativeBase):
@@ -62,13 +64,14 @@ def create_app(test_config=None):
 
     # Initialise Flask with the SQLAlchemy database extension
     db.init_app(app)
+    dispose_after_fork(db, app)
 
     # Initialise Flask with the Marshmallow extension
     ma.init_app(app)
 
     # Models are defined in the models module, so you must import them before calling create_all, otherwise SQLAlchemy
     # will not know about them.
-    from paralympics_rest.models import User, Region, Event
+    from paralympics_rest.models import User, Region, Event, Medal, Change
     # Create the tables in the database
     # create_all does not update tables if they are already in the database.
     with app.app_context():
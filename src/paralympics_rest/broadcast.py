@@ -0,0 +1,94 @@
+"""Broadcasts change notifications from the write routes to the clients of the /stream route.
+
+Each client of /stream subscribes and gets its own queue. The write routes publish a notification once their change
+has been committed. A single fan-out thread copies each notification to every subscriber's queue, so a write route
+never waits for slow clients.
+
+The queue of each subscriber is bounded. When a client does not keep up, the oldest notification in its queue is
+dropped. A notification only tells the client that the change feed has a new version, and the client reads the changes
+themselves from /changes, so a client that misses a notification catches up with the next one.
+
+The subscribers are kept in memory, so a notification only reaches the clients of /stream that are connected to the
+same process as the write route. When the app runs in several worker processes, e.g. gunicorn -w 4, a client of one
+worker is not notified of a change made by another. The change feed is in the database that all the workers share, so
+a client reads /changes when it gets a keep-alive too, see ChangeFeedClient.listen() in paralympics_common/sync.py.
+Notifying every worker straight away would need a message broker between them, e.g. Redis publish/subscribe.
+"""
+import queue
+import threading
+
+
+class Broadcaster:
+    """Fan-out of notifications to many subscribers.
+
+    Args:
+        maxsize: maximum number of notifications waiting in each subscriber's queue
+    """
+
+    def __init__(self, maxsize=100):
+        self.maxsize = maxsize
+        self._inbox = queue.Queue()
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def subscribe(self):
+        """Returns a new queue that receives every notification published from now on.
+
+        Call unsubscribe() with the queue when the client disconnects.
+        """
+        subscriber = queue.Queue(maxsize=self.maxsize)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        """Stops sending notifications to a queue returned by subscribe()."""
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, message):
+        """Sends a notification to all subscribers, returns without waiting for them.
+
+        Args:
+            message: dictionary that can be converted to JSON
+        """
+        self._start()
+        self._inbox.put(message)
+
+    @property
+    def subscriber_count(self):
+        """Number of clients that are currently subscribed."""
+        with self._lock:
+            return len(self._subscribers)
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._fan_out, name="change-broadcast", daemon=True)
+                self._thread.start()
+
+    def _fan_out(self):
+        while True:
+            message = self._inbox.get()
+            with self._lock:
+                subscribers = list(self._subscribers)
+            for subscriber in subscribers:
+                _put_latest(subscriber, message)
+
+
+def _put_latest(subscriber, message):
+    """Adds a message to a bounded queue, dropping the oldest message if the queue is full."""
+    while True:
+        try:
+            subscriber.put_nowait(message)
+            return
+        except queue.Full:
+            try:
+                subscriber.get_nowait()
+            except queue.Empty:
+                pass
+
+
+# Broadcaster shared by all requests to the app
+broadcaster = Broadcaster()
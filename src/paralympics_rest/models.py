@@ -1,3 +1,5 @@
+import datetime
+
 from sqlalchemy import ForeignKey
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from typing import List
@@ -37,6 +39,38 @@ class Event(db.Model):
     highlights: Mapped[str] = mapped_column(db.String, nullable=True)
 
 
+class Medal(db.Model):
+    __tablename__ = "medal"
+    id: Mapped[int] = mapped_column(db.Integer, primary_key=True)
+    NOC: Mapped[str] = mapped_column(db.Text, nullable=False, index=True)
+    team: Mapped[str] = mapped_column(db.Text, nullable=False)
+    type: Mapped[str] = mapped_column(db.Text, nullable=False, index=True)
+    games: Mapped[int] = mapped_column(db.Integer, nullable=True)
+    gold: Mapped[int] = mapped_column(db.Integer, nullable=True)
+    silver: Mapped[int] = mapped_column(db.Integer, nullable=True)
+    bronze: Mapped[int] = mapped_column(db.Integer, nullable=True)
+    total: Mapped[int] = mapped_column(db.Integer, nullable=True)
+
+
+class Change(db.Model):
+    """One change to an event or region, made through the REST API.
+
+    The version is the position of the change in the change feed. It only ever increases, as the table uses SQLite
+    AUTOINCREMENT so the number of a deleted row is never used again.
+    """
+    __tablename__ = "change"
+    __table_args__ = {"sqlite_autoincrement": True}
+    version: Mapped[int] = mapped_column(db.Integer, primary_key=True)
+    # 'event' or 'region'
+    entity: Mapped[str] = mapped_column(db.Text, nullable=False)
+    # Event id or region NOC code, as text
+    key: Mapped[str] = mapped_column(db.Text, nullable=False)
+    # 'upsert' when the record was added or updated, 'delete' when it was deleted
+    op: Mapped[str] = mapped_column(db.Text, nullable=False)
+    changed_at: Mapped[datetime.datetime] = mapped_column(db.DateTime, nullable=False,
+                                                          default=lambda: datetime.datetime.now(datetime.UTC))
+
+
 class User(db.Model):
     id: Mapped[int] = mapped_column(db.Integer, primary_key=True)
     email: Mapped[str] = mapped_column(db.String, unique=True, nullable=False)
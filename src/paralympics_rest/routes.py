@@ -1,19 +1,23 @@
 import datetime
+import json
+import queue
 
-from flask import current_app as app, request, abort, jsonify, make_response
+from flask import current_app as app, request, abort, jsonify, make_response, Response
 from marshmallow.exceptions import ValidationError
 from sqlalchemy import exc
 
 from paralympics_rest import db
-from paralympics_rest.models import Region, Event, User
-from paralympics_rest.schemas import RegionSchema, EventSchema, UserSchema
-from paralympics_rest.utilities import token_required, encode_auth_token
+from paralympics_rest.broadcast import broadcaster
+from paralympics_rest.models import Region, Event, Medal, User, Change
+from paralympics_rest.schemas import RegionSchema, EventSchema, MedalSchema, UserSchema
+from paralympics_rest.utilities import token_required, encode_auth_token, record_change, publish_change
 
 # Flask-Marshmallow Schemas
 regions_schema = RegionSchema(many=True)
 region_schema = RegionSchema()
 events_schema = EventSchema(many=True)
 event_schema = EventSchema()
+medals_schema = MedalSchema(many=True)
 user_schema = UserSchema()
 
 
@@ -86,7 +90,9 @@ def add_region():
 
         try:
             db.session.add(region)
+            change = record_change("region", region.NOC, "upsert")
             db.session.commit()
+            publish_change(change)
             return {"message": f"Region added with NOC= {region.NOC}"}
         except exc.SQLAlchemyError as e:
             app.logger.error(f"An error occurred saving the Region: {str(e)}")
@@ -111,7 +117,9 @@ def delete_region(noc_code):
     try:
         region = db.session.execute(db.select(Region).filter_by(NOC=noc_code)).scalar_one()
         db.session.delete(region)
+        change = record_change("region", noc_code, "delete")
         db.session.commit()
+        publish_change(change)
         return {"message": f"Region {noc_code} deleted."}
     except exc.SQLAlchemyError as e:
         # Log the exception with the error
@@ -161,7 +169,9 @@ def update_region(noc_code):
     # Commit the changes to the database
     try:
         db.session.add(region_update)
+        change = record_change("region", noc_code, "upsert")
         db.session.commit()
+        publish_change(change)
         # Return json message
         response = {"message": f"Region {noc_code} updated."}
         return response
@@ -176,18 +186,24 @@ def update_region(noc_code):
 def get_events():
     """Returns a list of events and their details in JSON.
 
+    The response has an ETag so a client that sends If-None-Match gets 304 Not Modified if the events are unchanged.
+
     Returns:
         JSON for all events
     """
     all_events = db.session.execute(db.select(Event)).scalars()
     result = events_schema.dump(all_events)
-    return result
+    response = make_response(jsonify(result))
+    response.add_etag()
+    return response.make_conditional(request)
 
 
 @app.get('/events/<event_id>')
 def get_event(event_id):
     """ Returns the event with the given id JSON.
 
+    The response has an ETag so a client that sends If-None-Match gets 304 Not Modified if the event is unchanged.
+
     Args:
         event_id (int): The id of the event to return
     Returns:
@@ -195,7 +211,9 @@ def get_event(event_id):
     """
     event = db.session.execute(db.select(Event).filter_by(id=event_id)).scalar_one()
     result = event_schema.dump(event)
-    return result
+    response = make_response(result)
+    response.add_etag()
+    return response.make_conditional(request)
 
 
 @app.post('/events')
@@ -211,7 +229,11 @@ def add_event():
     ev_json = request.get_json()
     event = event_schema.load(ev_json)
     db.session.add(event)
+    # Flush to get the id of the new event for the change feed
+    db.session.flush()
+    change = record_change("event", event.id, "upsert")
     db.session.commit()
+    publish_change(change)
     return {"message": f"Event added with id= {event.id}"}
 
 
@@ -226,7 +248,9 @@ def delete_event(event_id):
     """
     event = db.session.execute(db.select(Event).filter_by(id=event_id)).scalar_one()
     db.session.delete(event)
+    change = record_change("event", event_id, "delete")
     db.session.commit()
+    publish_change(change)
     return {"message": f"Event {event_id} deleted."}
 
 
@@ -239,20 +263,168 @@ def event_update(event_id):
     """
     # Find the event in the database
     existing_event = db.session.execute(
-        db.select(Event).filter_by(event_id=event_id)
+        db.select(Event).filter_by(id=event_id)
     ).scalar_one_or_none()
+    if existing_event is None:
+        abort(404, description="Event not found")
     # Get the updated details from the json sent in the HTTP patch request
     event_json = request.get_json()
     # Use Marshmallow to update the existing records with the changes from the json
     event_updated = event_schema.load(event_json, instance=existing_event, partial=True)
     # Commit the changes to the database
     db.session.add(event_updated)
+    change = record_change("event", event_id, "upsert")
     db.session.commit()
+    publish_change(change)
     # Return json success message
     response = {"message": f"Event with id={event_id} updated."}
     return response
 
 
+# CHANGE FEED ROUTES
+@app.get("/changes")
+def get_changes():
+    """Returns the events and regions changed since a version of the change feed in JSON.
+
+    A client keeps the version from the last response and sends it back as ?since=<version>, so it only downloads the
+    records that changed rather than all the events. A record that changed several times is only returned once, with
+    its current details. Use ?since=0 to get every change.
+
+    Returns:
+        JSON with the latest version and a list of changes, each with the version, entity (event or region), key
+        (event id or NOC code), op (upsert or delete) and data (the record for an upsert, otherwise None).
+        400 if since is not an integer.
+    """
+    since = request.args.get("since", 0)
+    try:
+        since = int(since)
+    except ValueError:
+        abort(400, description="since must be an integer version")
+    return changes_since(since)
+
+
+def changes_since(since):
+    """Returns the events and regions changed since a version of the change feed, see get_changes().
+
+    Also called in the same process by the combined server in paralympics_server, which needs an app context.
+
+    Args:
+        since (int): the version of the last change the client has applied
+
+    Returns:
+        dictionary with the latest version and the list of changes
+    """
+    changes = db.session.execute(
+        db.select(Change).where(Change.version > since).order_by(Change.version)
+    ).scalars().all()
+    # Keep only the latest change to each record
+    latest = {}
+    for change in changes:
+        latest.pop((change.entity, change.key), None)
+        latest[(change.entity, change.key)] = change
+    result = []
+    for change in latest.values():
+        data = None
+        if change.op == "upsert" and change.entity == "event":
+            data = event_schema.dump(db.session.get(Event, int(change.key)))
+        elif change.op == "upsert":
+            data = region_schema.dump(db.session.get(Region, change.key))
+        result.append({"version": change.version, "entity": change.entity, "key": change.key, "op": change.op,
+                       "data": data})
+    # The latest version is also returned when nothing has changed, so a client with a version from a database that
+    # has since been recreated can tell that it is ahead of the feed
+    version = changes[-1].version if changes else _latest_version()
+    return {"version": version, "changes": result}
+
+
+@app.get("/stream")
+def stream_changes():
+    """Streams a notification for each change to an event or region as server-sent events.
+
+    Each notification is an SSE 'change' event whose id is the version of the change feed and whose data is JSON with
+    the version, entity, key and op. A comment is sent when there have been no changes for a while so that proxies do
+    not close the connection, and so that clients check /changes for changes made in other worker processes, which
+    are not notified here (see broadcast.py). The first message is the current version, so a client can read any changes it missed
+    from /changes before it starts to wait for notifications.
+
+    Returns:
+        text/event-stream response that stays open until the client disconnects
+    """
+    subscriber = broadcaster.subscribe()
+    version = _latest_version()
+    keepalive = app.config.get("STREAM_KEEPALIVE", 15)
+    # Return the database connection to the pool now, rather than hold it for as long as the client is connected
+    db.session.close()
+
+    def generate():
+        try:
+            yield _sse("version", version, {"version": version})
+            while True:
+                try:
+                    message = subscriber.get(timeout=keepalive)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _sse("change", message["version"], message)
+        finally:
+            # Runs when the client disconnects and the server closes the generator
+            broadcaster.unsubscribe(subscriber)
+
+    response = Response(generate(), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    # Stop proxies such as nginx from buffering the stream
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+def _sse(event, event_id, data):
+    """Formats one server-sent event."""
+    return f"event: {event}\nid: {event_id}\ndata: {json.dumps(data)}\n\n"
+
+
+def _latest_version():
+    """Returns the version of the latest change, or 0 if there are no changes."""
+    return db.session.execute(db.select(db.func.max(Change.version))).scalar() or 0
+
+
+# MEDAL ROUTES
+@app.get("/medals")
+def get_medals():
+    """Returns the medals won by each team at the summer and winter games in JSON.
+
+    The results can be filtered with the query string parameters type (summer or winter) and NOC, e.g.
+    /medals?type=winter. The medal table has indexes on both.
+
+    Returns:
+        JSON for the medals, ordered by gold, silver then bronze medals
+    """
+    query = db.select(Medal).order_by(Medal.gold.desc(), Medal.silver.desc(), Medal.bronze.desc())
+    event_type = request.args.get("type")
+    if event_type:
+        query = query.filter_by(type=event_type)
+    noc_code = request.args.get("NOC")
+    if noc_code:
+        query = query.filter_by(NOC=noc_code)
+    medals = db.session.execute(query).scalars()
+    return medals_schema.dump(medals)
+
+
+@app.get("/medals/<noc_code>")
+def get_medals_for_region(noc_code):
+    """Returns the medals won by one team at the summer and winter games in JSON.
+
+    Args:
+        noc_code (str): The 3 character NOC code of the team
+
+    Returns:
+        JSON for the medals, or 404 if the team has no medals in the database
+    """
+    medals = db.session.execute(db.select(Medal).filter_by(NOC=noc_code)).scalars().all()
+    if not medals:
+        abort(404, description="No medals found for the NOC code")
+    return medals_schema.dump(medals)
+
+
 # AUTHENTICATION ROUTES
 @app.post("/register")
 def register():
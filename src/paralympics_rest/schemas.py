@@ -1,7 +1,7 @@
 """
 Schemas for each of the models in the paralympics app.
 """
-from paralympics_rest.models import Event, Region, User
+from paralympics_rest.models import Event, Medal, Region, User
 from paralympics_rest import db, ma
 
 
@@ -33,6 +33,15 @@ class EventSchema(ma.SQLAlchemyAutoSchema):
         include_relationships = True
 
 
+class MedalSchema(ma.SQLAlchemyAutoSchema):
+    """Marshmallow schema for the medals won by a team at the summer or winter games."""
+
+    class Meta:
+        model = Medal
+        load_instance = True
+        sqla_session = db.session
+
+
 class UserSchema(ma.SQLAlchemySchema):
     """Marshmallow schema defining the attributes for creating a new user.
 
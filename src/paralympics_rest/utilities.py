@@ -6,8 +6,10 @@ import jwt
 import pandas as pd
 from flask import request, make_response, current_app as app
 
+from paralympics_common.medals import read_medals
 from paralympics_rest import db
-from paralympics_rest.models import User, Region, Event
+from paralympics_rest.broadcast import broadcaster
+from paralympics_rest.models import User, Region, Event, Medal, Change
 
 
 def token_required(f):
@@ -82,6 +84,30 @@ def decode_auth_token(auth_token):
         return make_response({'message': "Invalid token. Please log in again."}, 401)
 
 
+def record_change(entity, key, op):
+    """Adds a change to the change feed in the current database session.
+
+    Call it before db.session.commit() in a route that changes an event or region, so that the change is saved in the
+    same transaction as the record.
+
+    :param entity: 'event' or 'region'
+    :param key: the event id or region NOC code
+    :param op: 'upsert' if the record was added or updated, 'delete' if it was deleted
+    :return: the Change, pass it to publish_change() after the commit
+    """
+    change = Change(entity=entity, key=str(key), op=op)
+    db.session.add(change)
+    return change
+
+
+def publish_change(change):
+    """Notifies the clients of the /stream route about a change that has been committed.
+
+    :param change: the Change returned by record_change()
+    """
+    broadcaster.publish({"version": change.version, "entity": change.entity, "key": change.key, "op": change.op})
+
+
 def add_data(db):
     """Adds data to the database if it does not already exist.
 
@@ -113,5 +139,12 @@ def add_data(db):
         events_df.index += 1
         events_df.to_sql("event", connection, if_exists="append", index_label='id')
 
+    # If there are no Medals, then add them
+    first_medal = db.session.execute(db.select(Medal)).first()
+    if not first_medal:
+        # Read the medals from the columnar copy of medals.xlsx, the workbook is only read when it has changed
+        medals_df = read_medals()
+        medals_df.to_sql("medal", connection, if_exists="append", index=False)
+
     # Close the database connection
     connection.close()
@@ -0,0 +1,91 @@
+"""Runs the REST API and both Dash apps on one Flask server in one process.
+
+When the apps run separately the Dash apps get the events from the REST API over HTTP, so each card costs a loopback
+request and the event is converted to JSON by the REST API and back again by the Dash app. On the combined server the
+Dash apps are mounted on the Flask app of the REST API, as in dash_sqlalchemy_example, and their REST client and change
+feed call the REST API's data layer directly. The REST API routes are unchanged for other clients.
+
+The apps are served at:
+    /                the REST API routes, e.g. /events
+    /dashboard/      the single page Dash app, paralympics_dash
+    /multi/          the multi-page Dash app, paralympics_dash_multi
+
+To run the combined server:
+
+    flask --app paralympics_server run
+"""
+import importlib
+import sys
+from pathlib import Path
+
+from paralympics_common.rest_client import rest_client
+from paralympics_common.sync import change_feed
+from paralympics_rest import create_app as create_rest_app, db
+
+DASHBOARD_PREFIX = "/dashboard/"
+MULTI_PREFIX = "/multi/"
+
+
+def create_app(test_config=None):
+    """Creates the REST API Flask app and mounts both Dash apps on it.
+
+    Args:
+        test_config: configuration for the REST API, see paralympics_rest.create_app()
+
+    Returns:
+        app: the Flask app
+    """
+    app = create_rest_app(test_config)
+
+    # The Dash apps start their REST client and change feed when they are imported, so use the local data layer first
+    use_local_data(app)
+
+    dashboard = _import_dashboard()
+    dashboard.init_app(app, routes_pathname_prefix=DASHBOARD_PREFIX, requests_pathname_prefix=DASHBOARD_PREFIX)
+
+    from paralympics_dash_multi.paralympics_app import app as multi
+    multi.init_app(app, routes_pathname_prefix=MULTI_PREFIX, requests_pathname_prefix=MULTI_PREFIX)
+
+    return app
+
+
+def use_local_data(app):
+    """Makes the shared REST client and change feed of the Dash apps call the REST API in this process.
+
+    Args:
+        app: the REST API Flask app
+    """
+    # The routes module is imported by create_app() in an app context, it holds the Marshmallow schemas
+    from paralympics_rest import routes
+    from paralympics_rest.broadcast import broadcaster
+    from paralympics_rest.models import Event
+
+    def get_event(event_id):
+        with app.app_context():
+            event = db.session.get(Event, event_id)
+            if event is None:
+                raise KeyError(event_id)
+            return routes.event_schema.dump(event)
+
+    def get_events():
+        with app.app_context():
+            return routes.events_schema.dump(db.session.execute(db.select(Event)).scalars())
+
+    def get_changes(since):
+        with app.app_context():
+            return routes.changes_since(since)
+
+    rest_client.use_local(get_event, get_events)
+    change_feed.use_local(get_changes, broadcaster)
+
+
+def _import_dashboard():
+    """Returns the Dash app from paralympics_dash/paralympics_dash.py.
+
+    The single page app is written to be run as a script from its own folder, so it imports figures.py as a top level
+    module. Add the folder to the end of the path so that import works here too.
+    """
+    dashboard_folder = str(Path(__file__).parent.parent.joinpath("paralympics_dash"))
+    if dashboard_folder not in sys.path:
+        sys.path.append(dashboard_folder)
+    return importlib.import_module("paralympics_dash.paralympics_dash").app
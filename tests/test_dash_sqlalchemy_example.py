@@ -0,0 +1,90 @@
+"""Stress test of the example app's chart data with concurrent reads and writes (see dash_sqlalchemy_example/data.py).
+
+The app is imported with its database in a temporary folder, set with the FLASK_SQLALCHEMY_DATABASE_URI environment
+variable that server.py reads, so the database in the package is not changed.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+import pytest
+from sqlalchemy import func, select, update
+
+
+@pytest.fixture(scope="module")
+def example(tmp_path_factory):
+    database = tmp_path_factory.mktemp("example").joinpath("paralympics.sqlite")
+    os.environ["FLASK_SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{database}"
+    try:
+        # The server module must be imported first, as it creates the db object the models use
+        from dash_sqlalchemy_example import server  # noqa: F401
+        from dash_sqlalchemy_example import data
+        from dash_sqlalchemy_example.models import Event
+    finally:
+        del os.environ["FLASK_SQLALCHEMY_DATABASE_URI"]
+    engine = data._engine()
+    assert engine.url.database == str(database), "dash_sqlalchemy_example was imported before the test"
+    return data, engine, Event, database
+
+
+def test_database_uses_wal(example):
+    data, engine, Event, database = example
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+
+
+def test_chart_data_changes_after_write_through_engine(example):
+    data, engine, Event, database = example
+    before = data.get_line_chart_data("participants")["participants"].sum()
+    with engine.begin() as connection:
+        connection.execute(update(Event).where(Event.participants.is_not(None))
+                           .values(participants=Event.participants + 1))
+    after = data.get_line_chart_data("participants")["participants"].sum()
+    assert after == before + data.get_line_chart_data("participants")["participants"].count()
+
+
+def test_chart_data_changes_after_write_by_another_connection(example):
+    """A commit in WAL mode only writes to the -wal file, which must still change the data version."""
+    data, engine, Event, database = example
+    data.get_line_chart_data("sports")
+    with sqlite3.connect(database) as connection:
+        connection.execute("UPDATE event SET sports = 999 WHERE id = 1")
+    assert 999 in data.get_line_chart_data("sports")["sports"].tolist()
+
+
+def test_concurrent_reads_and_writes(example):
+    data, engine, Event, database = example
+    errors = []
+    writes = []
+    stop = time.monotonic() + 2
+
+    def read():
+        try:
+            while time.monotonic() < stop:
+                for feature in data.LINE_CHART_FEATURES:
+                    assert not data.get_line_chart_data(feature).empty
+        except Exception as e:
+            errors.append(e)
+
+    def write():
+        try:
+            while time.monotonic() < stop:
+                with engine.begin() as connection:
+                    connection.execute(update(Event).where(Event.id == 2).values(events=Event.events + 1))
+                writes.append(1)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=read) for _ in range(8)] + [threading.Thread(target=write) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert writes
+    # Once the writes have stopped the cached data matches the database
+    with engine.connect() as connection:
+        expected = connection.execute(select(func.sum(Event.events))).scalar_one()
+    assert data.get_line_chart_data("events")["events"].sum() == expected
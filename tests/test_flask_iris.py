@@ -0,0 +1,206 @@
+"""Tests of the flask_iris prediction routes, model registry and prediction cache."""
+import gc
+import os
+import pickle
+import threading
+import weakref
+
+import pytest
+
+from flask_iris import create_app
+from flask_iris.model_registry import ModelRegistry, file_version
+from flask_iris.prediction_cache import PredictionCache
+
+ROW = [5.1, 3.5, 1.4, 0.2]
+
+
+@pytest.fixture(scope="module")
+def app():
+    # The routes are registered on the first app created, so the same app is used by all the tests
+    return create_app(test_config=True)
+
+
+@pytest.fixture()
+def client(app):
+    return app.test_client()
+
+
+@pytest.mark.parametrize("probabilities", [True, False])
+def test_predict_probabilities(client, probabilities):
+    response = client.post("/predict", json={"rows": [ROW], "probabilities": probabilities})
+    assert response.status_code == 200
+    prediction, = response.json["predictions"]
+    assert ("probabilities" in prediction) == probabilities
+
+
+@pytest.mark.parametrize("probabilities", ["false", "true", 0, 1, None])
+def test_predict_rejects_probabilities_that_are_not_a_boolean(client, probabilities):
+    response = client.post("/predict", json={"rows": [ROW], "probabilities": probabilities})
+    assert response.status_code == 400
+    assert "probabilities" in response.json["message"]
+
+
+def save_model(model_file, model):
+    """Saves a model, any object that can be pickled, to a temporary file and replaces the model file with it, as
+    create_ml_model.py does."""
+    write_replace(model_file, pickle.dumps(model))
+
+
+def write_replace(model_file, data):
+    """Writes the bytes to a temporary file and replaces the model file with it."""
+    tmp_file = model_file.with_suffix(".tmp")
+    tmp_file.write_bytes(data)
+    os.replace(tmp_file, model_file)
+
+
+def test_registry_loads_a_new_model_when_the_file_changes(tmp_path):
+    model_file = tmp_path / "model.pkl"
+    save_model(model_file, {"name": "first"})
+    registry = ModelRegistry(model_file, check_interval=0)
+    first = registry.get_loaded()
+    assert first.model == {"name": "first"}
+    assert first.version == file_version(model_file)
+    save_model(model_file, {"name": "second"})
+    second = registry.get_loaded()
+    assert second.model == {"name": "second"}
+    assert second.version == file_version(model_file) != first.version
+
+
+def test_registry_keeps_the_model_when_only_the_modification_time_changes(tmp_path):
+    model_file = tmp_path / "model.pkl"
+    save_model(model_file, {"name": "first"})
+    registry = ModelRegistry(model_file, check_interval=0)
+    model = registry.get_model()
+    save_model(model_file, {"name": "first"})
+    assert registry.get_model() is model
+
+
+def test_registry_keeps_the_old_model_when_the_new_file_cannot_be_read(tmp_path):
+    model_file = tmp_path / "model.pkl"
+    save_model(model_file, {"name": "first"})
+    registry = ModelRegistry(model_file, check_interval=0)
+    version = registry.get_loaded().version
+    # e.g. a file saved by a newer version of scikit-learn
+    write_replace(model_file, b"not a pickle")
+    loaded = registry.get_loaded()
+    assert loaded.model == {"name": "first"}
+    assert loaded.version == version
+
+
+def test_registry_without_a_model_file_raises(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        ModelRegistry(tmp_path / "model.pkl", check_interval=0).get_model()
+
+
+def test_registry_swaps_the_model_and_its_version_together(tmp_path):
+    model_file = tmp_path / "model.pkl"
+    versions = {}
+    for name in ("first", "second"):
+        model_file.write_bytes(pickle.dumps({"name": name}))
+        versions[file_version(model_file)] = name
+    registry = ModelRegistry(model_file, check_interval=0)
+    mismatches = []
+    stop = threading.Event()
+
+    def read():
+        while not stop.is_set():
+            loaded = registry.get_loaded()
+            if versions[loaded.version] != loaded.model["name"]:
+                mismatches.append(loaded)
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    for i in range(200):
+        save_model(model_file, {"name": ("first", "second")[i % 2]})
+    stop.set()
+    for reader in readers:
+        reader.join()
+    assert not mismatches
+
+
+class CountingModel:
+    """Stands in for a model, recording the rows it is asked to predict."""
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = []
+
+    def __call__(self, row):
+        self.rows.append(row)
+        return f"{self.name} {row}"
+
+
+def test_prediction_cache_answers_a_repeated_rounded_row_without_the_model():
+    cache = PredictionCache(maxsize=8)
+    model = CountingModel("v1")
+    first = cache.get_or_predict([5.1, 3.5, 1.4, 0.2], "v1", model)
+    second = cache.get_or_predict([5.12, 3.48, 1.4, 0.2], "v1", model)
+    assert first == second
+    assert model.rows == [[5.1, 3.5, 1.4, 0.2]]
+
+
+def test_prediction_cache_is_cleared_when_the_model_version_changes():
+    cache = PredictionCache(maxsize=8)
+    old_model, new_model = CountingModel("v1"), CountingModel("v2")
+    cache.get_or_predict(ROW, "v1", old_model)
+    cache.get_or_predict([6.0, 3.0, 4.5, 1.5], "v1", old_model)
+    assert cache.stats()["size"] == 2
+    assert cache.get_or_predict(ROW, "v2", new_model) == f"v2 {ROW}"
+    assert new_model.rows == [ROW]
+    assert cache.stats()["size"] == 1
+
+
+def test_prediction_cache_evicts_the_least_recently_used_row():
+    cache = PredictionCache(maxsize=2)
+    model = CountingModel("v1")
+    rows = [[1.0, 1.0, 1.0, 1.0], [2.0, 2.0, 2.0, 2.0], [3.0, 3.0, 3.0, 3.0]]
+    cache.get_or_predict(rows[0], "v1", model)
+    cache.get_or_predict(rows[1], "v1", model)
+    # Using the first row makes the second the least recently used
+    cache.get_or_predict(rows[0], "v1", model)
+    cache.get_or_predict(rows[2], "v1", model)
+    assert cache.stats()["size"] == 2
+    cache.get_or_predict(rows[0], "v1", model)
+    cache.get_or_predict(rows[1], "v1", model)
+    assert model.rows == [rows[0], rows[1], rows[2], rows[1]]
+
+
+def test_prediction_cache_stats():
+    cache = PredictionCache(maxsize=8)
+    assert cache.stats() == {"hits": 0, "misses": 0, "hit_rate": None, "size": 0, "maxsize": 8}
+    model = CountingModel("v1")
+    for _ in range(4):
+        cache.get_or_predict(ROW, "v1", model)
+    assert cache.stats() == {"hits": 3, "misses": 1, "hit_rate": 0.75, "size": 1, "maxsize": 8}
+    cache.clear()
+    assert cache.stats() == {"hits": 0, "misses": 0, "hit_rate": None, "size": 0, "maxsize": 8}
+
+
+
+def test_metrics_are_reset_after_fork_and_not_kept_alive():
+    from flask_iris import metrics
+
+    first, second = metrics.create_metrics(), metrics.create_metrics()
+    for m in (first, second):
+        m.varieties = {"Setosa": 1}
+    metrics.reset_metrics_after_fork()
+    assert first.varieties == second.varieties == dict.fromkeys(metrics.VARIETIES.tolist(), 0)
+    ref = weakref.ref(first)
+    del first
+    gc.collect()
+    assert ref() is None
+
+
+def test_coalescers_are_reset_after_fork_and_not_kept_alive():
+    from flask_iris import coalescer
+
+    config = {"PREDICTION_BATCH_ROWS": 8, "PREDICTION_BATCH_WAIT_MS": 1}
+    first = coalescer.create_coalescer(config)
+    first._thread = threading.current_thread()
+    coalescer.reset_coalescers_after_fork()
+    assert first._thread is None
+    ref = weakref.ref(first)
+    del first
+    gc.collect()
+    assert ref() is None
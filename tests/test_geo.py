@@ -0,0 +1,55 @@
+"""Tests of the map markers in paralympics_common.geo with many synthetic event locations."""
+import random
+import sqlite3
+
+import pytest
+
+from paralympics_common import geo
+
+EVENTS = 50_000
+
+
+@pytest.fixture(scope="module")
+def db_file(tmp_path_factory):
+    """A database with EVENTS events, each in its own city at a random location."""
+    db_file = tmp_path_factory.mktemp("geo").joinpath("locations.sqlite")
+    rng = random.Random(1)
+    connection = sqlite3.connect(db_file)
+    with connection:
+        connection.execute("CREATE TABLE event(id INTEGER PRIMARY KEY, host TEXT, year INTEGER)")
+        connection.execute("CREATE TABLE location(city TEXT, lat REAL, lon REAL)")
+        connection.executemany("INSERT INTO event VALUES (?, ?, 2000)",
+                               [(i, f"City {i}") for i in range(1, EVENTS + 1)])
+        connection.executemany("INSERT INTO location VALUES (?, ?, ?)",
+                               [(f"City {i}", rng.uniform(-90, 90), rng.uniform(-180, 180))
+                                for i in range(1, EVENTS + 1)])
+    connection.close()
+    return db_file
+
+
+@pytest.mark.parametrize("center", [None, (10, 10), (-60, 175)])
+def test_marker_count_is_bounded_at_every_zoom(db_file, center):
+    for zoom in range(geo.MAX_ZOOM + 2):
+        assert len(geo.get_map_markers(db_file, zoom, center)) <= geo.MAX_MARKERS
+
+
+def test_zooming_in_shows_more_detail(db_file):
+    assert len(geo.get_map_markers(db_file)) > 100
+    df_markers = geo.get_map_markers(db_file, 3, (10, 10))
+    # About 1 / 64 of the world is shown, each marker stands for a few events rather than hundreds
+    assert len(df_markers) > 100
+    assert df_markers["count"].sum() / len(df_markers) < 10
+
+
+def test_leaf_markers_keep_their_event_id(db_file):
+    df_locs = geo.get_event_locations(db_file)
+    event = df_locs.iloc[0]
+    df_markers = geo.get_map_markers(db_file, geo.MAX_ZOOM + 1, (event["lat"], event["lon"]))
+    assert (df_markers["count"] == 1).all()
+    assert df_markers["id"].notna().all()
+    assert event["id"] in set(df_markers["id"])
+    # A cluster with a single event is shown as the event, so the card is still displayed on hover
+    df_clusters = geo.get_map_markers(db_file, geo.MAX_ZOOM, (event["lat"], event["lon"]))
+    singles = df_clusters[df_clusters["count"] == 1]
+    assert singles["id"].notna().all()
+    assert df_clusters.loc[df_clusters["count"] > 1, "id"].isna().all()
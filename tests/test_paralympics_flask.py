@@ -0,0 +1,97 @@
+"""Tests of the paralympics_flask pages with an in-memory database."""
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine, text, update
+
+from paralympics_common import db as common_db
+from paralympics_flask import create_app, db
+from paralympics_flask.fragments import data_version, event_fragment
+from paralympics_flask.models import Event
+
+
+@pytest.fixture(scope="module")
+def app():
+    # The views are registered on the first app created, so the same app is used by all the tests
+    return create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "SQLALCHEMY_ECHO": False}, config_class="testing")
+
+
+@pytest.fixture()
+def client(app):
+    return app.test_client()
+
+
+def set_participants(app, event_id, participants):
+    with app.app_context():
+        db.session.execute(update(Event).where(Event.id == event_id).values(participants=participants))
+        db.session.commit()
+
+
+def test_chart_is_cached_until_the_data_changes(app, client):
+    # Each figure built has a new random id, so the same HTML means it came from the cache
+    first = client.get("/chart")
+    assert first.status_code == 200
+    assert client.get("/chart").data == first.data
+    set_participants(app, 1, 123456)
+    assert client.get("/chart").data != first.data
+
+
+def test_home_page_is_paginated(app, client):
+    response = client.get("/")
+    assert response.status_code == 200
+    assert response.data.count(b'class="row"') == app.config["EVENTS_PER_PAGE"]
+    assert client.get("/?page=2").status_code == 200
+    assert client.get("/?page=100").status_code == 404
+
+
+@pytest.mark.parametrize("url", ["/", "/events/3"])
+def test_etag_returns_304_until_the_data_changes(app, client, url):
+    etag = client.get(url).headers["ETag"]
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    with app.app_context():
+        db.session.execute(update(Event).where(Event.id == 3).values(host=f"Changed {url}"))
+        db.session.commit()
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert f"Changed {url}".encode() in response.data
+    assert response.headers["ETag"] != etag
+
+
+def test_missing_event_returns_404(client):
+    assert client.get("/events/9999").status_code == 404
+
+
+def test_production_requires_a_secret_key(monkeypatch):
+    monkeypatch.delenv("FLASK_SECRET_KEY", raising=False)
+    with pytest.raises(RuntimeError):
+        create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://"}, config_class="production")
+
+
+def test_fragments_are_current_with_wal(tmp_path):
+    # A change committed by another connection is in the -wal file, not the database file
+    path = tmp_path / "paralympics_flask.sqlite"
+    prod = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}", "SECRET_KEY": "test"},
+                      config_class="production")
+    prod.test_cli_runner().invoke(args=["seed"])
+    with prod.app_context():
+        assert db.session.execute(text("PRAGMA journal_mode")).scalar_one() == "wal"
+        first = event_fragment(3, data_version())
+        db.session.remove()
+        with sqlite3.connect(path) as connection:
+            connection.execute("UPDATE event SET host = 'Changed by another connection' WHERE id = 3")
+        assert "Changed by another connection" in event_fragment(3, data_version()).html
+        assert event_fragment(3, data_version()).etag != first.etag
+
+
+def test_engine_is_disposed_after_fork(app):
+    with app.app_context():
+        assert db.engine in common_db._engines
+
+
+def test_sqlite_pragmas_are_set_on_each_connection(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pragmas.sqlite'}")
+    common_db.set_sqlite_pragmas(engine, {"journal_mode": "WAL", "cache_size": -1000})
+    with engine.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert connection.execute(text("PRAGMA cache_size")).scalar() == -1000
+    engine.dispose()
@@ -0,0 +1,180 @@
+"""Tests of the paralympics_rest routes, and of the Dash apps' change feed client, with a temporary database."""
+import threading
+import time
+
+import pytest
+from werkzeug.serving import make_server
+
+from paralympics_common import events
+from paralympics_common.events import get_event
+from paralympics_common.rest_client import EventClient
+from paralympics_common.sync import ChangeFeedClient
+from paralympics_rest import create_app
+from paralympics_rest.broadcast import broadcaster
+
+@pytest.fixture(scope="module")
+def app(tmp_path_factory):
+    # The routes are registered on the first app created, so the same app is used by all the tests. The database is a
+    # file as the live server uses it from several threads.
+    db_file = tmp_path_factory.mktemp("rest").joinpath("paralympics_rest.sqlite")
+    return create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_file}", "TESTING": True})
+
+
+@pytest.fixture()
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture()
+def live_server(app):
+    """Serves the app over HTTP in a thread, yields its URL."""
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+@pytest.fixture()
+def feed(live_server):
+    """A change feed client of the live server, the changes it applies to the events are removed afterwards."""
+    feed = ChangeFeedClient(EventClient(base_url=live_server), interval=0.1)
+    yield feed
+    feed.stop()
+    events.clear_changes()
+
+
+def add_event(client, host):
+    """Adds a copy of event 1 with another host through the REST API, returns its id.
+
+    The tests change events they added, so the events from the CSV file stay as they are.
+    """
+    ev = {column: value for column, value in client.get("/events/1").json.items() if column != "id"}
+    ev["host"] = host
+    response = client.post("/events", json=ev)
+    assert response.status_code == 200
+    return int(response.json["message"].split("=")[-1])
+
+
+def wait_for(condition, timeout=5):
+    """Returns True once condition() is true, False if it is still false after timeout seconds."""
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_event_ids_match_the_rest_api(client, live_server):
+    # The Dash cards look events up by the ids the REST API gives them, so each id must be the same row in both, and
+    # the card must show the same details whichever way the event is read
+    rest = EventClient(base_url=live_server)
+    event_ids = sorted(ev["id"] for ev in client.get("/events").json)
+    assert event_ids == list(range(1, len(event_ids) + 1))
+    for event_id in event_ids:
+        rest_event = rest.get_event(event_id)
+        ev = get_event(event_id)
+        assert ev["id"] == event_id
+        columns = set(ev) & set(rest_event)
+        assert columns == set(ev)
+        assert {column: ev[column] for column in columns} == {column: rest_event[column] for column in columns}
+    with pytest.raises(KeyError):
+        get_event(len(event_ids) + 1)
+
+
+def test_medals_for_china(client):
+    # China's code is damaged in the workbook and its name ends with a non-breaking space
+    response = client.get("/medals/CHN")
+    assert response.status_code == 200
+    medals = {medal["type"]: medal for medal in response.json}
+    assert set(medals) == {"summer", "winter"}
+    assert all(medal["team"] == "China" for medal in medals.values())
+    assert medals["summer"]["gold"] == 535
+
+
+def test_stream_sends_the_version_then_each_change(client):
+    event_id = add_event(client, "Stream")
+    version = client.get("/changes?since=0").json["version"]
+    response = client.get("/stream", buffered=False)
+    messages = iter(response.response)
+    assert next(messages) == f'event: version\nid: {version}\ndata: {{"version": {version}}}\n\n'.encode()
+    client.patch(f"/events/{event_id}", json={"host": "Stream changed"})
+    change = next(messages).decode()
+    assert change.startswith(f"event: change\nid: {version + 1}\n")
+    assert f'"key": "{event_id}"' in change
+    response.close()
+    client.delete(f"/events/{event_id}")
+
+
+def test_stream_sends_keep_alives(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, "STREAM_KEEPALIVE", 0.1)
+    response = client.get("/stream", buffered=False)
+    messages = iter(response.response)
+    next(messages)
+    assert next(messages) == b": keep-alive\n\n"
+    response.close()
+
+
+def test_listen_applies_changes_not_notified_on_keep_alive(app, client, feed, monkeypatch):
+    # A change made by another worker process is committed to the database but not notified to this one's clients
+    monkeypatch.setitem(app.config, "STREAM_KEEPALIVE", 0.2)
+    event_id = add_event(client, "Listen")
+    feed.start()
+    assert wait_for(lambda: feed.version == client.get("/changes?since=0").json["version"])
+    with monkeypatch.context() as m:
+        m.setattr(broadcaster, "publish", lambda message: None)
+        client.patch(f"/events/{event_id}", json={"host": "Changed in another process"})
+    assert wait_for(lambda: get_event(event_id)["host"] == "Changed in another process")
+    client.delete(f"/events/{event_id}")
+
+
+def changes_to(client, event_id):
+    """Returns the changes to an event in the whole change feed."""
+    return [change for change in client.get("/changes?since=0").json["changes"] if change["key"] == str(event_id)]
+
+
+def test_changes_returns_one_upsert_with_the_current_data(client):
+    event_id = add_event(client, "First")
+    client.patch(f"/events/{event_id}", json={"host": "Second"})
+    client.patch(f"/events/{event_id}", json={"host": "Third"})
+    change, = changes_to(client, event_id)
+    assert change["op"] == "upsert"
+    assert change["entity"] == "event"
+    assert change["data"]["host"] == "Third"
+    client.delete(f"/events/{event_id}")
+
+
+def test_changes_returns_a_delete_without_data(client):
+    event_id = add_event(client, "Deleted")
+    client.delete(f"/events/{event_id}")
+    change, = changes_to(client, event_id)
+    assert change["op"] == "delete"
+    assert change["data"] is None
+
+
+def test_changes_rejects_a_since_that_is_not_a_version(client):
+    assert client.get("/changes?since=abc").status_code == 400
+
+
+def test_poll_detects_that_the_change_feed_restarted(client, feed):
+    # A change applied from the feed of a database that has since been recreated
+    events.apply_event_change(9999, {"host": "Gone"})
+    feed.version = 10 ** 6
+    feed.poll()
+    assert feed.version == client.get("/changes?since=0").json["version"]
+    with pytest.raises(KeyError):
+        get_event(9999)
+
+
+def test_get_event_reflects_a_patch_after_poll(client, feed):
+    event_id = add_event(client, "Before")
+    feed.poll()
+    assert get_event(event_id)["host"] == "Before"
+    client.patch(f"/events/{event_id}", json={"host": "After"})
+    assert feed.poll() == 1
+    assert get_event(event_id)["host"] == "After"
+    client.delete(f"/events/{event_id}")
+    feed.poll()
+    with pytest.raises(KeyError):
+        get_event(event_id)